@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+modulos_pesados = ['matplotlib', 'matplotlib.pyplot', 'scipy', 'scipy.optimize', 'pandas', 'numpy']
+
+codigo_de_medicao = '''
+import sys, json, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+print(json.dumps({{'duracao': duracao, 'carregados': [m for m in {modulos_pesados!r} if m in sys.modules]}}))
+'''
+
+
+def medir_importacao(modulo, repeticoes=10):
+    # Cada medição roda em um interpretador novo, como um processo de trabalho ou uma chamada da CLI
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    codigo = codigo_de_medicao.format(modulo=modulo, modulos_pesados=modulos_pesados)
+    duracoes = list()
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=diretorio, capture_output=True, text=True, check=True)
+        resultado = json.loads(saida.stdout)
+        duracoes.append(resultado['duracao'])
+    return {
+        'modulo': modulo,
+        'mediana [ms]': 1e3 * statistics.median(duracoes),
+        'minimo [ms]': 1e3 * min(duracoes),
+        'carregados': resultado['carregados'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede o tempo de importação dos módulos em interpretadores novos.')
+    parser.add_argument('modulos', nargs='*', default=['tratamento_de_dados', 'leitura_outputlog', 'numpy, pandas', 'matplotlib.pyplot, scipy.optimize'])
+    parser.add_argument('-n', '--repeticoes', type=int, default=10)
+    argumentos = parser.parse_args(argv)
+    print(f'{"Módulo":<34}  {"Mediana [ms]":>12}  {"Mínimo [ms]":>11}  Dependências pesadas carregadas')
+    for modulo in argumentos.modulos:
+        resultado = medir_importacao(modulo, argumentos.repeticoes)
+        print(f'{resultado["modulo"]:<34}  {resultado["mediana [ms]"]:>12.1f}  {resultado["minimo [ms]"]:>11.1f}  '
+              f'{", ".join(resultado["carregados"])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,73 +1,239 @@
-import re
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-
-plt.style.use(os.path.join(os.path.dirname(__file__), 'graficos.mplstyle'))
-
-relatorio = list()
-arquivos_log = [arquivo for arquivo in os.listdir() if re.search('output(.*)log', arquivo)]
-colunas_ordenadas = ['iter', 'continuity', 'x-velocity', 'y-velocity', 'z-velocity', 'k', 'omega',
-           'rp-velo-75', 'rp-velo-150', 'rp-velo-225', 'rp-volume-', 'rp-max-imp']
-iteracao = [colunas_ordenadas[0]]
-residuos = colunas_ordenadas[1:7]
-reports = colunas_ordenadas[7:]
-
-for arquivo_log in arquivos_log:
-    flag = False
-    dados = list()
-    with open(arquivo_log, 'r', encoding='utf-8') as arquivo:
-        for linha in arquivo:
-            if linha.strip().startswith('iter') and flag is False:
-                colunas = linha.strip().split()[0:-1]
-                colunas_velo = ['rp-velo-150', 'rp-velo-225', 'rp-velo-75']
-                colunas = [colunas_velo.pop(0) if i == 'rp-h-plane' and colunas_velo else i for i in colunas]
-                flag = True
-            if flag and re.search('\d$', linha):
-                dados.append(linha.strip().split()[0:-2])
-    arquivo.close()
-    dados = pd.DataFrame(dados, columns=colunas)
-    dados[iteracao] = dados[iteracao].astype(int)
-    dados[residuos] = dados[residuos].astype(float)
-    dados[reports] = dados[reports].astype(float)
-    dados = dados.reindex(columns=colunas_ordenadas)
-    relatorio.append(dados)
-
-relatorio = pd.concat(relatorio)
-relatorio.sort_values('iter', inplace=True)
-relatorio.reset_index(drop=True, inplace=True)
-
-fig, axs = plt.subplots(2, 2, figsize=(16, 9))
-x = relatorio[iteracao]
-legenda_velocidade = ['z = 75 mm', 'z = 150 mm', 'z = 225 mm']
-for velocidade_s, legenda in zip(reports[0:3], legenda_velocidade):
-    y = relatorio[velocidade_s]
-    axs[0, 0].plot(x, y, label=legenda, lw=1)
-axs[0, 0].set_title('Velocidade média nos planos horizontais')
-axs[0, 0].set_xlabel('Iteração')
-axs[0, 0].set_ylabel('Velocidade média [m/s]')
-axs[0, 0].legend()
-
-velocidade_v = reports[3]
-y = relatorio[velocidade_v]
-axs[0, 1].plot(x, y, label=velocidade_v, lw=1)
-axs[0, 1].set_title('Velocidade média em todo o tanque')
-axs[0, 1].set_xlabel('Iteração')
-axs[0, 1].set_ylabel('Velocidade média [m/s]')
-
-y_plus = reports[4]
-y = relatorio[y_plus]
-axs[1, 0].plot(x, y, label=y_plus, lw=1)
-axs[1, 0].set_title('Y plus máximo no impelidor')
-axs[1, 0].set_xlabel('Iteração')
-axs[1, 0].set_ylabel('Y plus')
-
-plt.yscale('log')
-for residuo in residuos:
-    y = relatorio[residuo]
-    axs[1, 1].plot(x, y, label=residuo, lw=1)
-axs[1, 1].set_title('Gráfico de resíduos')
-axs[1, 1].set_xlabel('Iteração')
-axs[1, 1].set_ylabel('Resíduos')
-axs[1, 1].legend()
-plt.show()
\ No newline at end of file
+import sys
+import json
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+mapeamento_padrao = {'rp-h-plane': ['rp-velo-150', 'rp-velo-225', 'rp-velo-75']}
+
+graficos_padrao = [
+    {
+        'titulo': 'Velocidade média nos planos horizontais',
+        'eixo_y': 'Velocidade média [m/s]',
+        'variaveis': ['rp-velo-75', 'rp-velo-150', 'rp-velo-225'],
+        'legendas': ['z = 75 mm', 'z = 150 mm', 'z = 225 mm'],
+    },
+    {
+        'titulo': 'Velocidade média em todo o tanque',
+        'eixo_y': 'Velocidade média [m/s]',
+        'variaveis': ['rp-volume-'],
+    },
+    {
+        'titulo': 'Y plus máximo no impelidor',
+        'eixo_y': 'Y plus',
+        'variaveis': ['rp-max-imp'],
+    },
+]
+
+
+def ler_json(valor):
+    if valor is None:
+        return None
+    if os.path.isfile(valor):
+        with open(valor, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    return json.loads(valor)
+
+
+def identificar_diretorio(caminho):
+    from tratamento_de_dados import padrao_csv, padrao_diretorio, padrao_outputlog
+    caminho_running = os.path.join(caminho, 'cases', 'running')
+    if os.path.isdir(caminho_running) and any(padrao_outputlog.search(arquivo) for arquivo in os.listdir(caminho_running)):
+        return 'simulacao'
+    # Também vale o uso antigo, com o script rodando no próprio diretório dos output*.log
+    if any(padrao_outputlog.search(arquivo) for arquivo in os.listdir(caminho) if os.path.isfile(os.path.join(caminho, arquivo))):
+        return 'simulacao'
+    for diretorio in os.listdir(caminho):
+        caminho_ensaio = os.path.join(caminho, diretorio)
+        if padrao_diretorio.search(diretorio) and os.path.isdir(caminho_ensaio):
+            if any(padrao_csv.search(arquivo) for arquivo in os.listdir(caminho_ensaio)):
+                return 'experimento'
+    return None
+
+
+def localizar_diretorios(raizes, recursivo=False):
+    tarefas = list()
+    for raiz in raizes:
+        raiz = os.path.abspath(raiz)
+        if not recursivo:
+            tipo = identificar_diretorio(raiz)
+            if tipo is not None and (tipo, raiz) not in tarefas:
+                tarefas.append((tipo, raiz))
+            continue
+        for caminho, diretorios, _ in os.walk(raiz):
+            tipo = identificar_diretorio(caminho)
+            if tipo is not None:
+                if (tipo, caminho) not in tarefas:
+                    tarefas.append((tipo, caminho))
+                # Os ensaios e os casos pertencem ao diretório já identificado
+                diretorios.clear()
+            else:
+                diretorios.sort()
+    return tarefas
+
+
+def obter_destinos(tarefas, saida):
+    # Com --saida, cada diretório é gravado no seu caminho relativo à raiz comum, para que diretórios
+    # de mesmo nome em campanhas distintas não escrevam (nem apaguem) os resultados uns dos outros
+    if saida is None:
+        return {caminho: None for _, caminho in tarefas}
+    raiz = os.path.dirname(os.path.commonpath([caminho for _, caminho in tarefas]))
+    destinos = {caminho: os.path.join(saida, os.path.relpath(caminho, raiz)) for _, caminho in tarefas}
+    for caminho, destino in destinos.items():
+        for outro_caminho, outro_destino in destinos.items():
+            if caminho != outro_caminho and os.path.commonpath([destino, outro_destino]) == destino:
+                raise ValueError(f'Os resultados de {outro_caminho} ficariam dentro dos de {caminho}')
+    # Um destino igual a um diretório de entrada, ou que o contenha, poria os resultados no meio dos dados brutos
+    for destino in destinos.values():
+        for _, caminho in tarefas:
+            if os.path.commonpath([destino, caminho]) == destino:
+                raise ValueError(f'O diretório de saída {destino} contém os dados de {caminho}')
+    return destinos
+
+
+def obter_disposicao(numero_de_graficos):
+    if numero_de_graficos <= 3:
+        return (1, max(numero_de_graficos, 2))
+    return (2, math.ceil(numero_de_graficos / 2))
+
+
+def selecionar_graficos(outputlog, graficos):
+    from tratamento_de_dados import colunas_residuos_outputlog
+    selecionados = [grafico for grafico in graficos if all(variavel in outputlog.columns for variavel in grafico['variaveis'])]
+    if not selecionados:
+        reports = [coluna for coluna in outputlog.columns if coluna not in ['iter'] + colunas_residuos_outputlog]
+        selecionados = [{'titulo': 'Reports', 'eixo_y': 'Valor', 'variaveis': reports}] if reports else list()
+    return selecionados
+
+
+def processar_simulacao(caminho, destino, opcoes):
+    from tratamento_de_dados import Simulacao
+    simulacao = Simulacao(caminho, mapeamento_colunas=opcoes['mapeamento'], historico=opcoes['historico'])
+    saida = simulacao.caminho_running if destino is None else destino
+    os.makedirs(saida, exist_ok=True)
+    outputlog = simulacao.obter_outputlog()
+    outputlog.to_csv(os.path.join(saida, f'tab_case_{simulacao.numero_da_simulacao}_outputlog.csv'), index=False)
+    if opcoes['figuras']:
+        graficos = selecionar_graficos(outputlog, opcoes['graficos'])
+        simulacao.plotar_outputlog(obter_disposicao(len(graficos) + 1), graficos, salvar=True, caminho=saida, outputlog=outputlog, formatos=opcoes['formatos'])
+    return f'{outputlog.shape[0]} iterações (última: {outputlog["iter"].iloc[-1]})'
+
+
+def processar_experimento(caminho, destino, opcoes):
+    from tratamento_de_dados import Experimento
+    experimento = Experimento(caminho, janela_media_movel=opcoes['janela_media_movel'], reamostragem=opcoes['reamostragem'])
+    # Os resultados ficam sempre numa pasta própria, a única que obter_resultados apaga e recria
+    diretorio = 'resultados' if destino is None else os.path.join(destino, 'resultados')
+    experimento.obter_resultados(diretorio=diretorio, intervalo=opcoes['intervalo'], formatos=opcoes['formatos'],
+                                 formatos_de_tabela=opcoes['tabelas'], figuras=opcoes['figuras'])
+    tempos_de_mistura = experimento.obter_tempos_de_mistura()
+    tempos_de_mistura.to_csv(os.path.join(experimento.caminho, diretorio, 'tab_tempos_de_mistura.csv'))
+    return f'{len(experimento.ensaios)} ensaios'
+
+
+def processar_diretorio(tipo, caminho, destino, opcoes):
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    inicio = time.perf_counter()
+    try:
+        if tipo == 'simulacao':
+            mensagem = processar_simulacao(caminho, destino, opcoes)
+        else:
+            mensagem = processar_experimento(caminho, destino, opcoes)
+        situacao = 'ok'
+    except Exception as erro:
+        mensagem = f'{type(erro).__name__}: {erro}'
+        situacao = 'erro'
+    return {'tipo': tipo, 'caminho': caminho, 'situacao': situacao, 'mensagem': mensagem,
+            'duracao': time.perf_counter() - inicio}
+
+
+def imprimir_resumo(resultados):
+    largura = max([len(resultado['caminho']) for resultado in resultados] + [len('Diretório')])
+    print(f'{"Diretório":<{largura}}  {"Tipo":<11}  {"Situação":<8}  {"Tempo [s]":>9}  Mensagem')
+    for resultado in resultados:
+        print(f'{resultado["caminho"]:<{largura}}  {resultado["tipo"]:<11}  {resultado["situacao"]:<8}  '
+              f'{resultado["duracao"]:>9.1f}  {resultado["mensagem"]}')
+    numero_de_erros = sum(resultado['situacao'] != 'ok' for resultado in resultados)
+    print(f'\n{len(resultados)} diretórios processados, {numero_de_erros} com erro')
+
+
+def criar_argumentos():
+    parser = argparse.ArgumentParser(
+        description='Processa em lote diretórios de simulação (cases/running/output*.log, ou output*.log no próprio diretório) '
+                    'e de experimento (ensaio_N/*.csv).')
+    parser.add_argument('diretorios', nargs='*', default=['.'],
+                        help='diretórios a processar (padrão: diretório atual)')
+    parser.add_argument('-r', '--recursivo', action='store_true',
+                        help='procura simulações e experimentos em toda a árvore de cada diretório')
+    parser.add_argument('-p', '--processos', type=int, default=os.cpu_count(),
+                        help='número de processos de trabalho (padrão: número de CPUs)')
+    parser.add_argument('-m', '--mapeamento', default=None,
+                        help='mapeamento de colunas do output.log em JSON (texto ou arquivo); '
+                             'padrão: rp-h-plane -> rp-velo-150, rp-velo-225, rp-velo-75')
+    parser.add_argument('--sem-mapeamento', action='store_true',
+                        help='mantém as colunas do output.log como estão')
+    parser.add_argument('--historico', action='store_true',
+                        help='mantém o histórico binário das iterações em cases/running e o reutiliza nas próximas leituras')
+    parser.add_argument('-g', '--graficos', default=None,
+                        help='lista de gráficos do output.log em JSON (texto ou arquivo), no formato de Simulacao.plotar_outputlog')
+    parser.add_argument('-s', '--saida', default=None,
+                        help='diretório onde gravar figuras e tabelas, com os caminhos relativos à raiz comum dos diretórios '
+                             'processados (padrão: junto aos dados)')
+    parser.add_argument('--sem-figuras', action='store_true',
+                        help='grava somente as tabelas e os relatórios')
+    parser.add_argument('-f', '--formatos', nargs='+', default=None,
+                        help='formatos das figuras (padrão: png pdf)')
+    parser.add_argument('-t', '--tabelas', nargs='+', default=None, choices=['csv', 'json', 'parquet'],
+                        help='formatos das tabelas de resumo dos experimentos (padrão: csv json, e parquet se disponível)')
+    parser.add_argument('--janela-media-movel', type=int, default=None,
+                        help='janela da média móvel dos condutivímetros')
+    parser.add_argument('--reamostragem', choices=['automatica', 'interpolacao', 'media', 'nenhuma'], default='automatica',
+                        help='grade comum de tempo dos eletrodos: automatica (só com intervalos distintos ou lacunas), '
+                             'interpolacao, media (por blocos) ou nenhuma (alinhamento pelo índice)')
+    parser.add_argument('--intervalo', type=float, nargs=2, default=None, metavar=('INICIO', 'FIM'),
+                        help='intervalo do eixo de tempo das figuras dos experimentos [min]')
+    return parser
+
+
+def main(argv=None):
+    argumentos = criar_argumentos().parse_args(argv)
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    opcoes = {
+        'mapeamento': None if argumentos.sem_mapeamento else (ler_json(argumentos.mapeamento) or mapeamento_padrao),
+        'historico': argumentos.historico,
+        'graficos': ler_json(argumentos.graficos) or graficos_padrao,
+        'saida': None if argumentos.saida is None else os.path.abspath(argumentos.saida),
+        'figuras': not argumentos.sem_figuras,
+        'formatos': argumentos.formatos,
+        'tabelas': argumentos.tabelas,
+        'janela_media_movel': argumentos.janela_media_movel,
+        'reamostragem': None if argumentos.reamostragem == 'nenhuma' else argumentos.reamostragem,
+        'intervalo': argumentos.intervalo,
+    }
+    tarefas = localizar_diretorios(argumentos.diretorios, argumentos.recursivo)
+    if not tarefas:
+        print('Nenhum diretório de simulação ou de experimento encontrado')
+        return 1
+    try:
+        destinos = obter_destinos(tarefas, opcoes['saida'])
+    except ValueError as erro:
+        print(erro)
+        return 1
+    resultados = list()
+    if argumentos.processos is None or argumentos.processos <= 1 or len(tarefas) == 1:
+        for tipo, caminho in tarefas:
+            resultados.append(processar_diretorio(tipo, caminho, destinos[caminho], opcoes))
+    else:
+        with ProcessPoolExecutor(max_workers=min(argumentos.processos, len(tarefas))) as executor:
+            futuros = [executor.submit(processar_diretorio, tipo, caminho, destinos[caminho], opcoes) for tipo, caminho in tarefas]
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+    resultados.sort(key=lambda resultado: resultado['caminho'])
+    imprimir_resumo(resultados)
+    return 0 if all(resultado['situacao'] == 'ok' for resultado in resultados) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,479 @@
+import io
 import re
 import os
+import gzip
+import json
+import lzma
 import math
+import time
 import shutil
+import struct
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
-from scipy.optimize import fsolve
-import matplotlib.pyplot as plt
-from matplotlib import ticker
 
-plt.style.use(os.path.join(os.path.dirname(__file__), 'graficos.mplstyle'))
-np.seterr(divide='ignore')
+# matplotlib e scipy só são importados no primeiro gráfico ou cálculo de GCI (ver configurar_graficos)
+plt = None
+ticker = None
+
+formatos_de_figura = ['png', 'pdf']
+formatos_raster = ['png', 'jpg', 'jpeg', 'tif', 'tiff', 'webp']
+formatos_de_tabela = ['csv', 'json']
 
 paleta_gnuplot = ['#9400d3ff', '#009e73ff', '#56b4e9ff', '#e69f00ff', '#f0e442ff', '#0072b2ff', '#e51e10ff', '#000000ff']
 dashes = ['-', '--', '-.', ':']
 
 padrao_csv = re.compile('(\w+)_(\d+)_(\w+)_(\d+).csv')
 padrao_diretorio = re.compile('(\w+)_(\d+)')
+padrao_outputlog = re.compile('output.*\.log(\.gz|\.xz|\.zst)?$')
+padrao_linha_outputlog = re.compile('^\d.*\d$')
+
+colunas_residuos_outputlog = ['continuity', 'x-velocity', 'y-velocity', 'z-velocity', 'k', 'omega']
+
+metodos_de_reamostragem = ['automatica', 'interpolacao', 'media']
+fator_de_lacuna = 2
+
+
+class Perfilador:
+
+    def __init__(self, ativo=False):
+        self._ativo = ativo
+        self._origem = time.perf_counter_ns()
+        self._etapas = list()
+
+    @property
+    def ativo(self):
+        return self._ativo
+
+    @property
+    def etapas(self):
+        return self._etapas
+
+    def ativar(self):
+        self._ativo = True
+
+    def desativar(self):
+        self._ativo = False
+
+    def limpar(self):
+        self._origem = time.perf_counter_ns()
+        self._etapas = list()
+
+    def etapa(self, nome, **atributos):
+        # Desativado, devolve sempre o mesmo objeto nulo: nenhum relógio é lido e nada é armazenado
+        if not self._ativo:
+            return _etapa_nula
+        return _Etapa(self, nome, atributos)
+
+    def obter_resumo(self):
+        colunas = ['etapa', 'chamadas', 'tempo_total [ms]', 'tempo_medio [ms]', 'tempo_maximo [ms]', 'linhas']
+        if not self.etapas:
+            return pd.DataFrame(columns=colunas).set_index('etapa')
+        dados = pd.DataFrame({
+            'etapa': [etapa.nome for etapa in self.etapas],
+            'duracao': [etapa.duracao / 1e6 for etapa in self.etapas],
+            'linhas': [etapa.linhas for etapa in self.etapas],
+        })
+        agrupados = dados.groupby('etapa', sort=False)
+        resumo = pd.DataFrame({
+            'chamadas': agrupados['duracao'].count(),
+            'tempo_total [ms]': agrupados['duracao'].sum(),
+            'tempo_medio [ms]': agrupados['duracao'].mean(),
+            'tempo_maximo [ms]': agrupados['duracao'].max(),
+            'linhas': agrupados['linhas'].sum(min_count=1),
+        })
+        resumo.index.name = 'etapa'
+        return resumo.sort_values('tempo_total [ms]', ascending=False)
+
+    def imprimir_resumo(self):
+        resumo = self.obter_resumo().to_string(float_format=lambda x: f'{x:.1f}')
+        print(resumo)
+        return resumo
+
+    def exportar_chrome_trace(self, caminho):
+        eventos = list()
+        for etapa in self.etapas:
+            argumentos = {chave: str(valor) for chave, valor in etapa.atributos.items()}
+            if etapa.linhas is not None:
+                argumentos['linhas'] = etapa.linhas
+            eventos.append({
+                'name': etapa.nome,
+                'cat': etapa.nome.split('.')[0],
+                'ph': 'X',
+                'ts': (etapa.inicio - self._origem) / 1e3,
+                'dur': etapa.duracao / 1e3,
+                'pid': etapa.pid,
+                'tid': etapa.tid,
+                'args': argumentos,
+            })
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, arquivo)
+
+
+class _Etapa:
+
+    __slots__ = ('perfilador', 'nome', 'atributos', 'linhas', 'inicio', 'duracao', 'pid', 'tid')
+
+    def __init__(self, perfilador, nome, atributos):
+        self.perfilador = perfilador
+        self.nome = nome
+        self.atributos = atributos
+        self.linhas = None
+        self.duracao = None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+    def __enter__(self):
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *excecao):
+        self.duracao = time.perf_counter_ns() - self.inicio
+        self.perfilador._etapas.append(self)
+        return False
+
+
+class _EtapaNula:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def __setattr__(self, nome, valor):
+        pass
+
+
+_etapa_nula = _EtapaNula()
+perfilador = Perfilador(ativo=os.environ.get('TRATAMENTO_PERFILADOR', '0') == '1')
+
+
+def configurar_graficos():
+    global plt, ticker
+    if plt is None:
+        with perfilador.etapa('importacao.matplotlib'):
+            import matplotlib.pyplot as pyplot
+            from matplotlib import ticker as localizadores
+            pyplot.style.use(os.path.join(os.path.dirname(__file__), 'graficos.mplstyle'))
+        plt, ticker = pyplot, localizadores
+    return plt, ticker
+
+
+def _detectar_primeiro_cruzamento(logaritmo_da_variancia, limite):
+    # logaritmo_da_variancia: (tempo x curvas); devolve, por curva, o índice do primeiro ponto que cruza
+    # o limite de cima para baixo, ou -1 quando não há cruzamento
+    cruzamentos = (logaritmo_da_variancia[1:] <= limite) & (logaritmo_da_variancia[:-1] > limite)
+    return np.where(cruzamentos.any(axis=0), cruzamentos.argmax(axis=0) + 1, -1)
+
+
+def _reamostrar_em_grade_comum(tempos, valores, grade, metodo='interpolacao', lacunas_maximas=None):
+    # tempos e valores: um vetor por eletrodo, com os tempos em segundos a partir da origem da grade;
+    # devolve a matriz (grade x eletrodos), com NaN fora do intervalo medido e dentro das lacunas
+    matriz = np.full((grade.size, len(tempos)), np.nan)
+    passo = grade[1] - grade[0] if grade.size > 1 else 1
+    for j, (tempo, valor) in enumerate(zip(tempos, valores)):
+        if metodo == 'interpolacao':
+            matriz[:, j] = np.interp(grade, tempo, valor, left=np.nan, right=np.nan)
+            if lacunas_maximas is not None and tempo.size > 1:
+                # Pontos da grade entre duas amostras mais afastadas que a lacuna máxima não são interpolados
+                anteriores = np.searchsorted(tempo, grade, side='right') - 1
+                internos = (anteriores >= 0) & (anteriores < tempo.size - 1)
+                saltos = np.diff(tempo)[anteriores[internos]]
+                em_lacuna = np.zeros(grade.size, dtype=bool)
+                em_lacuna[internos] = (saltos > lacunas_maximas[j]) & (grade[internos] > tempo[anteriores[internos]])
+                matriz[em_lacuna, j] = np.nan
+        elif metodo == 'media':
+            # Cada amostra entra no bloco semiaberto [t - passo/2, t + passo/2) do ponto t da grade; blocos vazios
+            # são as lacunas (np.rint arredonda os empates para o par e deixaria os blocos desiguais)
+            blocos = np.floor(tempo / passo + 0.5).astype(int)
+            dentro = (blocos >= 0) & (blocos < grade.size)
+            contagem = np.bincount(blocos[dentro], minlength=grade.size)
+            soma = np.bincount(blocos[dentro], weights=valor[dentro], minlength=grade.size)
+            with np.errstate(invalid='ignore'):
+                matriz[:, j] = soma / contagem
+        else:
+            raise ValueError(f'Método de reamostragem desconhecido: {metodo}')
+    return matriz
+
+
+def _abrir_arquivo_de_texto(caminho, encoding='utf-8'):
+    # Os arquivos comprimidos são descomprimidos em blocos durante a leitura, linha a linha
+    if caminho.endswith('.gz'):
+        return gzip.open(caminho, 'rt', encoding=encoding)
+    if caminho.endswith('.xz'):
+        return lzma.open(caminho, 'rt', encoding=encoding)
+    if caminho.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('A leitura de arquivos .zst requer o pacote zstandard') from None
+        leitor = zstandard.ZstdDecompressor().stream_reader(open(caminho, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(leitor, encoding=encoding)
+    return open(caminho, 'r', encoding=encoding)
+
+
+def _salvar_figura(fig, caminho, nome_do_arquivo, formatos=None):
+    formatos = formatos_de_figura if formatos is None else list(formatos)
+    formatos_a_rasterizar = [formato for formato in formatos if formato.lower() in formatos_raster]
+    if len(formatos_a_rasterizar) > 1:
+        # Vários formatos raster: a figura é desenhada uma única vez e a mesma imagem é codificada em cada
+        # formato; os formatos vetoriais precisam de um desenho próprio cada um
+        with perfilador.etapa('figura.rasterizar', arquivo=nome_do_arquivo):
+            imagem, dpi = _rasterizar_figura(fig)
+        if imagem is not None:
+            for formato in formatos_a_rasterizar:
+                with perfilador.etapa('figura.salvar', arquivo=f'{nome_do_arquivo}.{formato}'):
+                    imagem_formato = imagem if formato.lower() in ['png', 'tif', 'tiff', 'webp'] else imagem.convert('RGB')
+                    imagem_formato.save(os.path.join(caminho, f'{nome_do_arquivo}.{formato}'), dpi=(dpi, dpi))
+            formatos = [formato for formato in formatos if formato not in formatos_a_rasterizar]
+    for formato in formatos:
+        with perfilador.etapa('figura.salvar', arquivo=f'{nome_do_arquivo}.{formato}'):
+            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.{formato}'))
+
+
+def _salvar_tabela(tabela, caminho, nome_do_arquivo, formatos=None):
+    # Sem formatos informados, o Parquet é incluído somente quando há um mecanismo instalado para gravá-lo
+    if formatos is None:
+        formatos = formatos_de_tabela + (['parquet'] if _parquet_disponivel() else [])
+    for formato in formatos:
+        arquivo = os.path.join(caminho, f'{nome_do_arquivo}.{formato}')
+        with perfilador.etapa('tabela.salvar', arquivo=f'{nome_do_arquivo}.{formato}'):
+            if formato == 'csv':
+                tabela.to_csv(arquivo, index=False)
+            elif formato == 'json':
+                tabela.to_json(arquivo, orient='records', date_format='iso', force_ascii=False, indent=2)
+            elif formato == 'parquet':
+                if not _parquet_disponivel():
+                    raise ImportError('A gravação em Parquet requer o pacote pyarrow ou fastparquet')
+                tabela.to_parquet(arquivo, index=False)
+            else:
+                raise ValueError(f'Formato de tabela desconhecido: {formato}')
+
+
+def _parquet_disponivel():
+    from importlib.util import find_spec
+    return find_spec('pyarrow') is not None or find_spec('fastparquet') is not None
+
+
+def _rasterizar_figura(fig):
+    from PIL import Image
+    plt, _ = configurar_graficos()
+    dpi = fig.dpi if plt.rcParams['savefig.dpi'] == 'figure' else plt.rcParams['savefig.dpi']
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='rgba', dpi=dpi)
+    largura, altura = int(fig.get_figwidth() * dpi), int(fig.get_figheight() * dpi)
+    if len(buffer.getvalue()) != 4 * largura * altura:
+        return None, dpi
+    return Image.frombuffer('RGBA', (largura, altura), buffer.getvalue(), 'raw', 'RGBA', 0, 1), dpi
+
+
+class ModeloDeFigura:
+
+    # Figura de um único eixo criada uma vez e reaproveitada: a cada atualização as curvas existentes
+    # recebem os novos dados, em vez de se criar uma figura nova por ensaio
+
+    def __init__(self, figsize=None):
+        plt, _ = configurar_graficos()
+        self._fig, self._ax = plt.subplots(figsize=figsize)
+        self._linhas = list()
+        self._faixa = None
+        self._referencia = None
+        self._texto_referencia = None
+
+    @property
+    def fig(self):
+        return self._fig
+
+    @property
+    def ax(self):
+        return self._ax
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+        return False
+
+    def atualizar(self, curvas, titulo=None, eixo_x=None, eixo_y=None, limite_x=None, limite_y=None,
+                  localizador_x=None, localizador_y=None, faixa=None, referencia=None, legenda=None):
+        _, ticker = configurar_graficos()
+        ax = self.ax
+        for i, curva in enumerate(curvas):
+            x, y = curva['x'], curva['y']
+            estilo = {chave: valor for chave, valor in curva.items() if chave not in ['x', 'y']}
+            if i < len(self._linhas):
+                linha = self._linhas[i]
+                linha.set_data(x, y)
+                linha.set(visible=True, **estilo)
+            else:
+                linha, = ax.plot(x, y, **estilo)
+                self._linhas.append(linha)
+        for linha in self._linhas[len(curvas):]:
+            linha.set_visible(False)
+        if self._faixa is not None:
+            self._faixa.remove()
+            self._faixa = None
+        if faixa is not None:
+            self._faixa = ax.fill_between(faixa[0], faixa[1], faixa[2], color='gray', alpha=0.25)
+        if referencia is not None:
+            x, y, texto = referencia
+            if self._referencia is None:
+                self._referencia, = ax.plot(x, [y]*2, color='gray', ls='--')
+                self._texto_referencia = ax.text(0, y, texto, color='gray', fontsize='xx-small')
+            else:
+                self._referencia.set_data(x, [y]*2)
+                self._texto_referencia.set_position((0, y))
+                self._texto_referencia.set_text(texto)
+        if titulo is not None:
+            ax.set_title(titulo)
+        if eixo_x is not None:
+            ax.set_xlabel(eixo_x)
+        if eixo_y is not None:
+            ax.set_ylabel(eixo_y)
+        ax.set_autoscale_on(True)
+        ax.relim(visible_only=True)
+        ax.autoscale_view()
+        if limite_x is not None:
+            ax.set_xlim(limite_x)
+        if limite_y is not None:
+            ax.set_ylim(limite_y)
+        if localizador_x is not None:
+            ax.xaxis.set_major_locator(ticker.MultipleLocator(localizador_x))
+        if localizador_y is not None:
+            ax.yaxis.set_major_locator(ticker.MultipleLocator(localizador_y))
+        visiveis = [linha for linha in self._linhas if linha.get_visible()]
+        if legenda is not False:
+            ax.legend(handles=visiveis, **(legenda or dict()))
+        return self
+
+    def salvar(self, caminho, nome_do_arquivo, formatos=None):
+        _salvar_figura(self.fig, caminho, nome_do_arquivo, formatos)
+
+    def fechar(self):
+        plt, _ = configurar_graficos()
+        plt.close(self.fig)
+
+
+def _finalizar_figura(figura, modelo, salvar, caminho, nome_do_arquivo, formatos):
+    # Figuras criadas pelo próprio método são fechadas depois de salvas; um modelo recebido continua aberto
+    plt, _ = configurar_graficos()
+    if salvar:
+        figura.salvar(caminho, nome_do_arquivo, formatos)
+        if modelo is None:
+            figura.fechar()
+    elif modelo is None:
+        plt.show()
+
+
+class Preprocessamento:
+
+    def __init__(self, janela_hampel=None, limite_hampel=3, janela_mediana=None, janela_deriva=None, limites=None):
+        # Etapas, nesta ordem: remoção de picos (filtro de Hampel), filtro de mediana, média móvel do condutivímetro
+        # (se houver), correção de deriva (inclinação ajustada às últimas janela_deriva observações, já misturadas)
+        # e recorte em limites
+        if janela_deriva is not None and janela_deriva < 2:
+            raise ValueError('A janela da correção de deriva requer ao menos duas observações')
+        self._janela_hampel = janela_hampel
+        self._limite_hampel = limite_hampel
+        self._janela_mediana = janela_mediana
+        self._janela_deriva = janela_deriva
+        self._limites = None if limites is None else tuple(limites)
+
+    @property
+    def janela_hampel(self):
+        return self._janela_hampel
+
+    @property
+    def limite_hampel(self):
+        return self._limite_hampel
+
+    @property
+    def janela_mediana(self):
+        return self._janela_mediana
+
+    @property
+    def janela_deriva(self):
+        return self._janela_deriva
+
+    @property
+    def limites(self):
+        return self._limites
+
+    @property
+    def chave(self):
+        return (self.janela_hampel, self.limite_hampel, self.janela_mediana, self.janela_deriva, self.limites)
+
+    def __eq__(self, outro):
+        return isinstance(outro, Preprocessamento) and self.chave == outro.chave
+
+    def __hash__(self):
+        return hash(self.chave)
+
+    def aplicar(self, series, janela_media_movel=None):
+        # As séries dos eletrodos, sem média móvel, são empilhadas em uma matriz (tempo x eletrodos), com o final
+        # das mais curtas preenchido pelo último valor, e todas as etapas rodam sobre a matriz inteira
+        tamanhos = np.array([serie.size for serie in series])
+        matriz = np.empty((tamanhos.max(), len(series)))
+        for j, serie in enumerate(series):
+            matriz[:serie.size, j] = serie
+            matriz[serie.size:, j] = serie[-1]
+        matriz = self._processar_matriz(matriz, tamanhos, janela_media_movel)
+        return [matriz[:tamanho, j] for j, tamanho in enumerate(tamanhos)]
+
+    def _processar_matriz(self, matriz, tamanhos, janela_media_movel=None):
+        from scipy import ndimage
+        if self.janela_hampel is not None:
+            medianas = ndimage.median_filter(matriz, size=(self.janela_hampel, 1), mode='nearest')
+            desvios = np.abs(matriz - medianas)
+            escala = 1.4826 * ndimage.median_filter(desvios, size=(self.janela_hampel, 1), mode='nearest')
+            matriz = np.where(desvios > self.limite_hampel * escala, medianas, matriz)
+        if self.janela_mediana is not None:
+            matriz = ndimage.median_filter(matriz, size=(self.janela_mediana, 1), mode='nearest')
+        if type(janela_media_movel) is int and janela_media_movel != 0:
+            # Mesma média móvel do condutivímetro (rolling(janela, min_periods=1).mean()), aplicada depois da
+            # remoção de picos para que cada pico não seja espalhado pela janela antes de ser detectado
+            acumulada = np.vstack([np.zeros(matriz.shape[1]), np.cumsum(matriz, axis=0)])
+            fim = np.arange(1, matriz.shape[0] + 1)
+            inicio = np.maximum(fim - janela_media_movel, 0)
+            matriz = (acumulada[fim] - acumulada[inicio]) / (fim - inicio)[:, None]
+        if self.janela_deriva is not None:
+            # Inclinação por mínimos quadrados nas últimas observações válidas de cada eletrodo; eletrodos com
+            # menos de duas observações não são corrigidos
+            x = tamanhos - self.janela_deriva + np.arange(self.janela_deriva)[:, None]
+            validos = x >= 0
+            x = np.maximum(x, 0)
+            y = matriz[x, np.arange(matriz.shape[1])]
+            contagem = validos.sum(axis=0)
+            x_centrado = (x - np.sum(x * validos, axis=0) / contagem) * validos
+            y_centrado = (y - np.sum(y * validos, axis=0) / contagem) * validos
+            denominador = np.sum(x_centrado**2, axis=0)
+            inclinacoes = np.divide(np.sum(x_centrado * y_centrado, axis=0), denominador, out=np.zeros(matriz.shape[1]), where=denominador > 0)
+            matriz = matriz - inclinacoes * np.arange(matriz.shape[0])[:, None]
+        if self.limites is not None:
+            matriz = np.clip(matriz, *self.limites)
+        return matriz
+
 
 class Condutivimetro:
 
-    def __init__(self, caminho, janela_media_movel=None):
+    def __init__(self, caminho, janela_media_movel=None, origem=None):
         self._caminho = caminho
         self._janela_media_movel = janela_media_movel
         self._obter_arquivo()
-        self._obter_base_de_dados()
-        self._tratar_base_de_dados()
+        if origem is None:
+            self._obter_base_de_dados()
+            self._tratar_base_de_dados()
+        else:
+            self._reaproveitar_base_de_dados(origem)
 
     @property
     def janela_media_movel(self):
@@ -80,28 +528,36 @@ class Condutivimetro:
     
     @property
     def data(self):
-        return list(self.dados_tratados_originais['horario'])[0].strftime('%d/%m/%Y')
+        return self.dados_tratados_originais['horario'].iloc[0].strftime('%d/%m/%Y')
     
     @property
     def horario_de_inicio(self):
-        return list(self.dados_tratados_originais['horario'])[0].strftime('%H:%M:%S')
+        return self.dados_tratados_originais['horario'].iloc[0].strftime('%H:%M:%S')
     
     @property
     def horario_de_termino(self):
-        return list(self.dados_tratados_originais['horario'])[-1].strftime('%H:%M:%S')
+        return self.dados_tratados_originais['horario'].iloc[-1].strftime('%H:%M:%S')
 
     @property
     def intervalo_de_tempo(self):
-        return (self.dados_tratados['horario'][1] - self.dados_tratados['horario'][0]).seconds
+        # A mediana dos intervalos não é afetada por lacunas ou por amostras repetidas
+        return self.dados_tratados['horario'].diff().median().total_seconds()
     
     @property
     def tempo(self):
-        return np.array(self.dados_tratados.index * self.intervalo_de_tempo)
+        horario = self.dados_tratados['horario']
+        return np.array((horario - horario.iloc[0]).dt.total_seconds())
     
     @property
     def condutividade_eletrica(self):
         return np.array(self.dados_tratados['condutividade_eletrica'])
     
+    @property
+    def condutividade_eletrica_sem_media_movel(self):
+        if 'condutividade_eletrica_sem_media_movel' in self.dados_tratados.columns:
+            return np.array(self.dados_tratados['condutividade_eletrica_sem_media_movel'])
+        return self.condutividade_eletrica
+    
     @property
     def condutividade_inicial(self):
         return self.condutividade_eletrica[0]
@@ -119,7 +575,8 @@ class Condutivimetro:
         c = self.condutividade_eletrica
         c_0 = self.condutividade_inicial
         c_inf = self.condutividade_final
-        return (c - c_0) / (c_inf - c_0)
+        with np.errstate(divide='ignore'):
+            return (c - c_0) / (c_inf - c_0)
     
     @property
     def temperatura_media(self):
@@ -127,34 +584,73 @@ class Condutivimetro:
     
     def obter_condutividade_eletrica(self, normalizada=False):
         return self.condutividade_eletrica_normalizada if normalizada else self.condutividade_eletrica
+
+    def obter_lacunas(self, lacuna_maxima=None):
+        horario = self.dados_tratados['horario']
+        saltos = horario.diff().dt.total_seconds()
+        selecao = np.array(saltos > self._obter_lacuna_maxima(lacuna_maxima))
+        indices = np.nonzero(selecao)[0]
+        return pd.DataFrame({
+            'inicio': np.array(horario.iloc[indices - 1]),
+            'fim': np.array(horario.iloc[indices]),
+            'duracao [s]': np.array(saltos.iloc[indices]),
+        })
+
+    def possui_lacunas(self, lacuna_maxima=None):
+        saltos = self.dados_tratados['horario'].diff().dt.total_seconds()
+        return bool((saltos > self._obter_lacuna_maxima(lacuna_maxima)).any())
+
+    def _obter_lacuna_maxima(self, lacuna_maxima=None):
+        return fator_de_lacuna * self.intervalo_de_tempo if lacuna_maxima is None else lacuna_maxima
     
+    def obter_resumo(self):
+        return {
+            'ensaio': self.numero_prefixo,
+            'eletrodo': self.numero_eletrodo,
+            'prefixo': self.prefixo,
+            'arquivo': self.arquivo,
+            'data': self.data,
+            'horario_de_inicio': self.horario_de_inicio,
+            'horario_de_termino': self.horario_de_termino,
+            'numero_de_observacoes': self.numero_de_observacoes,
+            'intervalo_de_tempo': self.intervalo_de_tempo,
+            'condutividade_inicial': self.condutividade_inicial,
+            'condutividade_final': self.condutividade_final,
+            'condutividade_maxima': self.condutividade_maxima,
+            'temperatura_media': self.temperatura_media,
+        }
+
     def imprimir_relatorio(self):
-        relatorio = f'''
+        relatorio = __class__._formatar_relatorio(self.obter_resumo())
+        print(relatorio)
+        return relatorio
+
+    @staticmethod
+    def _formatar_relatorio(resumo):
+        return f'''
 RELATÓRIO POR CONDUTIVÍMETRO
 
-{self.prefixo}: {self.numero_prefixo}
-Eletrodo: {self.numero_eletrodo}
+{resumo['prefixo']}: {resumo['ensaio']}
+Eletrodo: {resumo['eletrodo']}
 
-Data: {self.data}
-Horário de início: {self.horario_de_inicio}
-Horário de término: {self.horario_de_termino}
+Data: {resumo['data']}
+Horário de início: {resumo['horario_de_inicio']}
+Horário de término: {resumo['horario_de_termino']}
 
-Número de observações: {self.numero_de_observacoes}
-Intervalo entre cada observação: {self.intervalo_de_tempo} s
+Número de observações: {resumo['numero_de_observacoes']}
+Intervalo entre cada observação: {resumo['intervalo_de_tempo']:g} s
 
-Condutividade elétrica inicial: {self.condutividade_inicial:.1f} mS
-Condutividade elétrica final: {self.condutividade_final:.1f} mS
-Condutividade elétrica máxima: {self.condutividade_maxima:.1f} mS
+Condutividade elétrica inicial: {resumo['condutividade_inicial']:.1f} mS
+Condutividade elétrica final: {resumo['condutividade_final']:.1f} mS
+Condutividade elétrica máxima: {resumo['condutividade_maxima']:.1f} mS
 
-Temperatura média: {self.temperatura_media:.1f} °C
+Temperatura média: {resumo['temperatura_media']:.1f} °C
 '''
-        print(relatorio)
-        return relatorio
 
     def resetar_dados(self):
         self.dados_tratados = self.dados_originais.copy()
 
-    def plotar_condutividade_eletrica(self, normalizada=False, salvar=False, intervalo=None, caminho=None):
+    def plotar_condutividade_eletrica(self, normalizada=False, salvar=False, intervalo=None, caminho=None, modelo=None, formatos=None):
         condutividade = self.obter_condutividade_eletrica(normalizada)
         if normalizada:
             eixo_y = 'Condutividade elétrica normalizada'
@@ -164,29 +660,17 @@ Temperatura média: {self.temperatura_media:.1f} °C
             eixo_y = 'Condutividade elétrica [mS]'
             limite_y = None
             nome_do_arquivo = f'fig_gr_{self.prefixo.lower()}_{self.numero_prefixo}_{self.eletrodo}_perfil_de_condutividade_eletrica'
-        fig, ax = plt.subplots()
-        ax.plot(self.tempo / 60, condutividade, label=f'Eletrodo {self.numero_eletrodo}')
-        if normalizada:
-            ax.fill_between([0, np.array(self.tempo)[-1] / 60] if intervalo is None else intervalo,
-                            [0.95, 0.95], [1.05, 1.05], color='gray', alpha=0.25)
-        ax.set_title(f'{self.prefixo} {self.numero_prefixo} - Perfil de condutividade elétrica')
-        ax.set_xlabel('Tempo [min]')
-        ax.set_ylabel(eixo_y)
-        ax.set_xlim([0, 15*((self.tempo[-1]/60)//15)]) if intervalo is None else ax.set_xlim(intervalo)
-        ax.set_ylim(limite_y)
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
-        ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
-        ax.legend()
-        if salvar:
-            if caminho is None:
-                caminho = os.path.dirname(self.caminho)
-            else:
-                caminho = caminho
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.png'))
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.pdf'))
-            plt.close()
-        else:
-            plt.show()
+        tempo_final = self.tempo[-1] / 60
+        figura = ModeloDeFigura() if modelo is None else modelo
+        figura.atualizar([{'x': self.tempo / 60, 'y': condutividade, 'label': f'Eletrodo {self.numero_eletrodo}'}],
+                         titulo=f'{self.prefixo} {self.numero_prefixo} - Perfil de condutividade elétrica',
+                         eixo_x='Tempo [min]', eixo_y=eixo_y,
+                         limite_x=[0, 15*(tempo_final//15)] if intervalo is None else intervalo, limite_y=limite_y,
+                         localizador_x=5, localizador_y=1,
+                         faixa=([0, tempo_final] if intervalo is None else intervalo, [0.95, 0.95], [1.05, 1.05]) if normalizada else None)
+        if caminho is None:
+            caminho = os.path.dirname(self.caminho)
+        _finalizar_figura(figura, modelo, salvar, caminho, nome_do_arquivo, formatos)
 
     def _obter_arquivo(self):
         arquivo = os.path.basename(self.caminho)
@@ -202,21 +686,41 @@ Temperatura média: {self.temperatura_media:.1f} °C
         self._numero_eletrodo = int(padrao_csv.search(self.arquivo).group(4))
 
     def _obter_base_de_dados(self):
-        self._dados_originais = pd.read_csv(self.caminho, encoding='latin1', sep=';', decimal=',')
+        with perfilador.etapa('condutivimetro.leitura_csv', arquivo=self.caminho) as etapa:
+            self._dados_originais = pd.read_csv(self.caminho, encoding='latin1', sep=';', decimal=',')
+            etapa.linhas = self._dados_originais.shape[0]
 
     def _tratar_base_de_dados(self):
         dados = self._dados_originais.iloc[:, 0:4].copy()
         colunas_renomeadas = ['data', 'hora', 'condutividade_eletrica', 'temperatura']
         colunas_mapeadas = {i: j for i, j in zip(dados.columns, colunas_renomeadas)}
         dados.rename(columns=colunas_mapeadas, inplace=True)
-        dados = __class__._converter_tipo_de_dados(dados)
-        dados['horario'] = dados.apply(__class__._obter_horario, axis=1)
+        with perfilador.etapa('condutivimetro.conversao_tipos', arquivo=self.caminho) as etapa:
+            dados = __class__._converter_tipo_de_dados(dados)
+            etapa.linhas = dados.shape[0]
+        with perfilador.etapa('condutivimetro.conversao_horarios', arquivo=self.caminho) as etapa:
+            dados['horario'] = dados.apply(__class__._obter_horario, axis=1)
+            etapa.linhas = dados.shape[0]
         dados.drop(columns=['data', 'hora'], inplace=True)
         dados = dados.reindex(columns=['horario', 'condutividade_eletrica', 'temperatura'])
         self._dados_tratados_originais = dados
         self._dados_tratados = dados.copy()
+        self._aplicar_media_movel()
+
+    def _reaproveitar_base_de_dados(self, origem):
+        # Os dados já lidos são compartilhados; somente os dados tratados, que podem ser alterados, são copiados
+        self._dados_originais = origem._dados_originais
+        self._dados_tratados_originais = origem._dados_tratados_originais
+        self._dados_tratados = origem._dados_tratados_originais.copy()
+        self._aplicar_media_movel()
+
+    def _aplicar_media_movel(self):
         if type(self.janela_media_movel) is int and self.janela_media_movel != 0:
-            self._dados_tratados['condutividade_eletrica'] = self._dados_tratados['condutividade_eletrica'].rolling(self.janela_media_movel, min_periods=1).mean()
+            with perfilador.etapa('condutivimetro.media_movel', arquivo=self.caminho) as etapa:
+                # Os valores sem média móvel são mantidos para o pré-processamento (ver Preprocessamento)
+                self._dados_tratados['condutividade_eletrica_sem_media_movel'] = self._dados_tratados['condutividade_eletrica']
+                self._dados_tratados['condutividade_eletrica'] = self._dados_tratados['condutividade_eletrica'].rolling(self.janela_media_movel, min_periods=1).mean()
+                etapa.linhas = self._dados_tratados.shape[0]
 
     @staticmethod
     def _obter_horario(dados):
@@ -235,22 +739,60 @@ Temperatura média: {self.temperatura_media:.1f} °C
 
 class Ensaio:
 
-    def __init__(self, caminho, porcentagem=95, dados_correcao_horarios=None, janela_media_movel=None):
+    def __init__(self, caminho, porcentagem=95, dados_correcao_horarios=None, janela_media_movel=None, condutivimetros=None,
+                 reamostragem='automatica', intervalo_de_reamostragem=None, lacuna_maxima=None, preprocessamento=None):
+        if reamostragem is not None and reamostragem not in metodos_de_reamostragem:
+            raise ValueError(f'Método de reamostragem desconhecido: {reamostragem}')
         self._caminho = caminho
         self._porcentagem = porcentagem
         self._janela_media_movel = janela_media_movel
+        self._reamostragem = reamostragem
+        self._intervalo_de_reamostragem = intervalo_de_reamostragem
+        self._lacuna_maxima = lacuna_maxima
         self._obter_diretorio()
-        self._instanciar_condutivimetros()
+        self._instanciar_condutivimetros(condutivimetros)
         self._color_id = (self.numero_prefixo - 1) % 8
         self._ls_id = (self.numero_prefixo - 1) // 8
         if dados_correcao_horarios is not None:
             self._dados_correcao_horarios = dados_correcao_horarios
             self._corrigir_horarios_iniciais()
+        self._preprocessamento = None
+        self._condutividades_sem_preprocessamento = None
+        self._cache_preprocessamento = dict()
+        if preprocessamento is not None:
+            self.aplicar_preprocessamento(preprocessamento)
 
     @property
     def janela_media_movel(self):
         return self._janela_media_movel
 
+    @property
+    def preprocessamento(self):
+        return self._preprocessamento
+
+    @property
+    def reamostragem(self):
+        return self._reamostragem
+
+    @property
+    def intervalo_de_reamostragem(self):
+        return self._intervalo_de_reamostragem
+
+    @property
+    def lacuna_maxima(self):
+        return self._lacuna_maxima
+
+    @property
+    def metodo_de_reamostragem(self):
+        # No modo automático, a grade comum só é usada quando os eletrodos têm intervalos distintos ou lacunas;
+        # caso contrário, os eletrodos continuam alinhados pelo índice
+        if self.reamostragem != 'automatica':
+            return self.reamostragem
+        intervalos = {condutivimetro.intervalo_de_tempo for condutivimetro in self.condutivimetros}
+        if len(intervalos) > 1 or any(condutivimetro.possui_lacunas(self.lacuna_maxima) for condutivimetro in self.condutivimetros):
+            return 'interpolacao'
+        return None
+
     @property
     def color_id(self):
         return self._color_id
@@ -293,7 +835,7 @@ class Ensaio:
     
     @property
     def condutivimetros_dict(self):
-        return {condutivimetro.eletrodo: condutivimetro for condutivimetro in self.condutivimetros}
+        return self._condutivimetros_dict
     
     @property
     def porcentagem(self):
@@ -301,7 +843,7 @@ class Ensaio:
 
     @property
     def limite(self):
-        return np.log10((self.porcentagem/100 - 1)**2)
+        return __class__._obter_limite(self.porcentagem)
 
     @property
     def temperatura_media(self):
@@ -310,11 +852,10 @@ class Ensaio:
     
     @property
     def intervalo_de_tempo(self):
-        lista_intervalo_de_tempo = [condutivimetro.intervalo_de_tempo for condutivimetro in self.condutivimetros]
-        if all(intervalo_de_tempo == lista_intervalo_de_tempo[0] for intervalo_de_tempo in lista_intervalo_de_tempo):
-            return lista_intervalo_de_tempo[0]
-        else:
-            print('Intervalos de tempo distintos')
+        # Com intervalos distintos, a grade comum usa o maior deles, a menos que outro seja informado
+        if self.intervalo_de_reamostragem is not None and self.metodo_de_reamostragem is not None:
+            return self.intervalo_de_reamostragem
+        return max(condutivimetro.intervalo_de_tempo for condutivimetro in self.condutivimetros)
 
     @property
     def tempos_de_mistura(self):
@@ -323,42 +864,110 @@ class Ensaio:
     def __getitem__(self, chave):
         return self.condutivimetros_dict[chave]
     
+    def obter_resumo(self):
+        tempos_de_mistura = [tm[0] for tm in self.tempos_de_mistura]
+        return {
+            'ensaio': self.numero_prefixo,
+            'prefixo': self.prefixo,
+            'numero_de_eletrodos': len(self.condutivimetros),
+            'porcentagem': self.porcentagem,
+            'limite': self.limite,
+            'tempo_de_mistura': tempos_de_mistura[0] if tempos_de_mistura else np.nan,
+            'numero_de_cruzamentos': len(tempos_de_mistura),
+            'temperatura_media': self.temperatura_media,
+        }, tempos_de_mistura
+
     def imprimir_relatorio(self):
-        tempos_de_mistura_a_imprimir = '\n    '.join([f'{tm[0]:.0f} s | {tm[0]/60:.2f} min' for tm in self.tempos_de_mistura])
-        relatorio = f'''
-RELATÓRIO POR {self.prefixo.upper()}
+        relatorio = __class__._formatar_relatorio(*self.obter_resumo())
+        print(relatorio)
+        return relatorio
+
+    @staticmethod
+    def _formatar_relatorio(resumo, tempos_de_mistura):
+        tempos_de_mistura_a_imprimir = '\n    '.join([f'{tm:.0f} s | {tm/60:.2f} min' for tm in tempos_de_mistura])
+        return f'''
+RELATÓRIO POR {resumo['prefixo'].upper()}
 
-{self.prefixo}: {self.numero_prefixo}
+{resumo['prefixo']}: {resumo['ensaio']}
 
-Possíveis tempos de mistura ({self.porcentagem}%: {self.limite:.2f}):
+Possíveis tempos de mistura ({resumo['porcentagem']}%: {resumo['limite']:.2f}):
     {tempos_de_mistura_a_imprimir}
 
-Temperatura média: {self.temperatura_media:.1f} °C
+Temperatura média: {resumo['temperatura_media']:.1f} °C
 '''
-        print(relatorio)
-        return relatorio
     
-    def obter_condutividade_eletrica(self, normalizada=False, extendida=False):
-        lista_de_eletrodos = [pd.DataFrame({condutivimetro.eletrodo: condutivimetro.obter_condutividade_eletrica(normalizada)}) for condutivimetro in self.condutivimetros]
-        dados_condutividade_eletrica = pd.concat(lista_de_eletrodos, axis=1)
-        if (normalizada and extendida):
-            dados_condutividade_eletrica.fillna(1.0, inplace=True)
+    def aplicar_preprocessamento(self, preprocessamento=None):
+        # Parte sempre das condutividades sem média móvel, que o pré-processamento aplica depois da remoção de picos;
+        # o resultado de cada configuração fica em cache e None restaura os valores anteriores ao primeiro pré-processamento
+        if self._condutividades_sem_preprocessamento is None:
+            self._condutividades_sem_preprocessamento = [condutivimetro.condutividade_eletrica for condutivimetro in self.condutivimetros]
+        if preprocessamento is None:
+            condutividades = self._condutividades_sem_preprocessamento
+        elif preprocessamento in self._cache_preprocessamento:
+            condutividades = self._cache_preprocessamento[preprocessamento]
         else:
+            with perfilador.etapa('ensaio.preprocessamento', ensaio=self.ensaio) as etapa:
+                condutividades = preprocessamento.aplicar([condutivimetro.condutividade_eletrica_sem_media_movel for condutivimetro in self.condutivimetros],
+                                                          self.janela_media_movel)
+                etapa.linhas = sum(condutividade.size for condutividade in condutividades)
+            self._cache_preprocessamento[preprocessamento] = condutividades
+        for condutivimetro, condutividade in zip(self.condutivimetros, condutividades):
+            condutivimetro._dados_tratados['condutividade_eletrica'] = condutividade
+        self._preprocessamento = preprocessamento
+
+    def obter_condutividade_eletrica(self, normalizada=False, extendida=False):
+        metodo = self.metodo_de_reamostragem
+        if metodo is not None:
+            with perfilador.etapa('ensaio.reamostragem', ensaio=self.ensaio, metodo=metodo) as etapa:
+                dados_condutividade_eletrica = self._obter_condutividade_eletrica_reamostrada(normalizada, extendida, metodo)
+                etapa.linhas = dados_condutividade_eletrica.shape[0]
+            return dados_condutividade_eletrica
+        with perfilador.etapa('ensaio.alinhamento', ensaio=self.ensaio) as etapa:
+            lista_de_eletrodos = [pd.DataFrame({condutivimetro.eletrodo: condutivimetro.obter_condutividade_eletrica(normalizada)}) for condutivimetro in self.condutivimetros]
+            dados_condutividade_eletrica = pd.concat(lista_de_eletrodos, axis=1)
+            if (normalizada and extendida):
+                dados_condutividade_eletrica.fillna(1.0, inplace=True)
+            else:
+                dados_condutividade_eletrica.dropna(inplace=True)
+            # dados_condutividade_eletrica = dados_condutividade_eletrica.reindex(columns=sorted(dados_condutividade_eletrica.columns))
+            tempo = np.array(dados_condutividade_eletrica.index * self.intervalo_de_tempo)
+            dados_condutividade_eletrica.insert(0, 'tempo', tempo)
+            etapa.linhas = dados_condutividade_eletrica.shape[0]
+        return dados_condutividade_eletrica
+
+    def _obter_condutividade_eletrica_reamostrada(self, normalizada, extendida, metodo):
+        # Os tempos partem do último horário inicial, quando todos os eletrodos já estão medindo
+        origem = max(condutivimetro.dados_tratados['horario'].iloc[0] for condutivimetro in self.condutivimetros)
+        tempos = [np.array((condutivimetro.dados_tratados['horario'] - origem).dt.total_seconds()) for condutivimetro in self.condutivimetros]
+        valores = [condutivimetro.obter_condutividade_eletrica(normalizada) for condutivimetro in self.condutivimetros]
+        intervalo = self.intervalo_de_tempo
+        grade = np.arange(max(tempo[-1] for tempo in tempos) // intervalo + 1) * intervalo
+        lacunas_maximas = [condutivimetro._obter_lacuna_maxima(self.lacuna_maxima) for condutivimetro in self.condutivimetros]
+        matriz = _reamostrar_em_grade_comum(tempos, valores, grade, metodo, lacunas_maximas)
+        if normalizada and extendida:
+            # Somente o trecho após a última medição de cada eletrodo é estendido; as lacunas continuam vazias
+            ultimos = grade.size - 1 - np.argmax(~np.isnan(matriz[::-1]), axis=0)
+            matriz[np.arange(grade.size)[:, None] > ultimos] = 1.0
+        dados_condutividade_eletrica = pd.DataFrame(matriz, columns=[condutivimetro.eletrodo for condutivimetro in self.condutivimetros])
+        dados_condutividade_eletrica.insert(0, 'tempo', grade)
+        if not (normalizada and extendida):
             dados_condutividade_eletrica.dropna(inplace=True)
-        # dados_condutividade_eletrica = dados_condutividade_eletrica.reindex(columns=sorted(dados_condutividade_eletrica.columns))
-        tempo = np.array(dados_condutividade_eletrica.index * self.intervalo_de_tempo)
-        dados_condutividade_eletrica.insert(0, 'tempo', tempo)
         return dados_condutividade_eletrica
 
     def obter_logaritmo_da_variancia(self, extendida=False):
         dados_condutividade_eletrica =  self.obter_condutividade_eletrica(normalizada=True, extendida=extendida)
-        n = dados_condutividade_eletrica.shape[1] - 1
-        c = np.array(dados_condutividade_eletrica.iloc[:, 1:].copy())
-        logaritmo_da_variancia = pd.DataFrame({'logaritmo_da_variancia': np.log10(np.sum(((c - 1)**2), axis=1)/n)})
-        dados = pd.concat([dados_condutividade_eletrica, logaritmo_da_variancia], axis=1)
+        with perfilador.etapa('ensaio.variancia', ensaio=self.ensaio) as etapa:
+            c = np.array(dados_condutividade_eletrica.iloc[:, 1:].copy())
+            # Nas lacunas, a variância considera apenas os eletrodos com dados
+            n = np.sum(~np.isnan(c), axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                logaritmo_da_variancia = pd.DataFrame({'logaritmo_da_variancia': np.log10(np.nansum(((c - 1)**2), axis=1)/n)},
+                                                      index=dados_condutividade_eletrica.index)
+            dados = pd.concat([dados_condutividade_eletrica, logaritmo_da_variancia], axis=1)
+            etapa.linhas = dados.shape[0]
         return dados
 
-    def plotar_condutividade_eletrica(self, normalizada=False, extendida=False, salvar=False, intervalo=None, caminho=None):
+    def plotar_condutividade_eletrica(self, normalizada=False, extendida=False, salvar=False, intervalo=None, caminho=None, modelo=None, formatos=None):
         condutividade = self.obter_condutividade_eletrica(normalizada, extendida)
         if normalizada:
             eixo_y = 'Condutividade elétrica normalizada'
@@ -368,64 +977,38 @@ Temperatura média: {self.temperatura_media:.1f} °C
             eixo_y = 'Condutividade elétrica [mS]'
             limite_y = None
             nome_do_arquivo = f'fig_gr_{self.ensaio}_perfil_de_condutividade_eletrica'
-        fig, ax = plt.subplots()
-        for condutivimetro in self.condutivimetros:
-            ax.plot(condutividade['tempo'] / 60, condutividade[condutivimetro.eletrodo],
-                    label=f'Eletrodo {condutivimetro.numero_eletrodo}',
-                    color=f'C{condutivimetro.numero_eletrodo-1}'
-                    )
-        if normalizada:
-            ax.fill_between([0, np.array(condutividade['tempo'])[-1] / 60] if intervalo is None else intervalo,
-                            [0.95, 0.95], [1.05, 1.05], color='gray', alpha=0.25)
-        ax.set_title(f'{self.prefixo} {self.numero_prefixo} - Perfil de condutividade elétrica')
-        ax.set_xlabel('Tempo [min]')
-        ax.set_ylabel(eixo_y)
-        ax.set_xlim([0, 15*((np.array(condutividade['tempo'])[-1]/60)//15)]) if intervalo is None else ax.set_xlim(intervalo)
-        ax.set_ylim(limite_y)
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
-        ax.legend()
-        if salvar:
-            if caminho is None:
-                caminho = self.caminho
-            else:
-                caminho = caminho
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.png'))
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.pdf'))
-            plt.close()
-        else:
-            plt.show()
-
-    def plotar_logaritmo_da_variancia(self, extendida=False, salvar=False, intervalo=None, caminho=None):
+        tempo = np.array(condutividade['tempo']) / 60
+        curvas = [{'x': tempo, 'y': np.array(condutividade[condutivimetro.eletrodo]),
+                   'label': f'Eletrodo {condutivimetro.numero_eletrodo}',
+                   'color': f'C{condutivimetro.numero_eletrodo-1}'}
+                  for condutivimetro in self.condutivimetros]
+        figura = ModeloDeFigura() if modelo is None else modelo
+        figura.atualizar(curvas,
+                         titulo=f'{self.prefixo} {self.numero_prefixo} - Perfil de condutividade elétrica',
+                         eixo_x='Tempo [min]', eixo_y=eixo_y,
+                         limite_x=[0, 15*(tempo[-1]//15)] if intervalo is None else intervalo, limite_y=limite_y,
+                         localizador_x=5,
+                         faixa=([0, tempo[-1]] if intervalo is None else intervalo, [0.95, 0.95], [1.05, 1.05]) if normalizada else None)
+        if caminho is None:
+            caminho = self.caminho
+        _finalizar_figura(figura, modelo, salvar, caminho, nome_do_arquivo, formatos)
+
+    def plotar_logaritmo_da_variancia(self, extendida=False, salvar=False, intervalo=None, caminho=None, modelo=None, formatos=None):
         dados = self.obter_logaritmo_da_variancia(extendida)
         logaritmo_da_variancia = np.array(dados['logaritmo_da_variancia'])
         tempo = np.array(dados['tempo'])
-        fig, ax = plt.subplots()
-        ax.plot(tempo / 60, logaritmo_da_variancia,
-                color=f'C{self.color_id}',
-                ls=dashes[self.ls_id],
-                label=f'{self.prefixo} {self.numero_prefixo}')
-        ax.plot([0, tempo[-1]/60] if intervalo is None else intervalo,
-                [self.limite]*2, color='gray', ls='--')
-        ax.text(0, self.limite, f'{self.porcentagem}\\%: {self.limite:.2f}', color='gray', fontsize='xx-small')
-        ax.set_title(f'Logaritmo da variância RMS por tempo')
-        ax.set_xlabel('Tempo [min]')
-        ax.set_ylabel('Logaritmo da variância RMS da\ncondutividade elétrica normalizada')
-        ax.set_xlim([0, 15*((tempo[-1]/60)//15)]) if intervalo is None else ax.set_xlim(intervalo)
-        ax.set_ylim([-6, 2])
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
-        # ax.grid(which='minor')
-        ax.legend()
-        if salvar:
-            nome_do_arquivo = f'fig_gr_{self.ensaio}_logaritmo_da_variancia'
-            if caminho is None:
-                caminho = self.caminho
-            else:
-                caminho = caminho
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.png'))
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.pdf'))
-            plt.close()
-        else:
-            plt.show()
+        figura = ModeloDeFigura() if modelo is None else modelo
+        figura.atualizar([{'x': tempo / 60, 'y': logaritmo_da_variancia,
+                           'color': f'C{self.color_id}', 'ls': dashes[self.ls_id],
+                           'label': f'{self.prefixo} {self.numero_prefixo}'}],
+                         titulo='Logaritmo da variância RMS por tempo',
+                         eixo_x='Tempo [min]', eixo_y='Logaritmo da variância RMS da\ncondutividade elétrica normalizada',
+                         limite_x=[0, 15*((tempo[-1]/60)//15)] if intervalo is None else intervalo, limite_y=[-6, 2],
+                         localizador_x=5,
+                         referencia=([0, tempo[-1]/60] if intervalo is None else intervalo, self.limite, f'{self.porcentagem}\\%: {self.limite:.2f}'))
+        if caminho is None:
+            caminho = self.caminho
+        _finalizar_figura(figura, modelo, salvar, caminho, f'fig_gr_{self.ensaio}_logaritmo_da_variancia', formatos)
 
     def _obter_diretorio(self):
         diretorio = os.path.basename(self.caminho)
@@ -439,25 +1022,157 @@ Temperatura média: {self.temperatura_media:.1f} °C
         self._prefixo = padrao_diretorio.search(self.diretorio).group(1)
         self._numero_prefixo = int(padrao_diretorio.search(self.diretorio).group(2))
 
-    def _instanciar_condutivimetros(self):
-        lista_de_arquivos = sorted(os.listdir(self.caminho))
-        # Verificar como ordenar os eletrodos:
-        # lista_de_arquivos.sort(key=lambda arquivo: int(padrao_csv.search(arquivo).group(4)))
-        self._condutivimetros = [Condutivimetro(os.path.join(self.caminho, arquivo), janela_media_movel=self.janela_media_movel) for arquivo in lista_de_arquivos if padrao_csv.search(arquivo)]
+    def _instanciar_condutivimetros(self, condutivimetros=None):
+        if condutivimetros is not None:
+            self._condutivimetros = sorted(condutivimetros, key=lambda condutivimetro: condutivimetro.arquivo)
+        else:
+            lista_de_arquivos = sorted(os.listdir(self.caminho))
+            # Verificar como ordenar os eletrodos:
+            # lista_de_arquivos.sort(key=lambda arquivo: int(padrao_csv.search(arquivo).group(4)))
+            with perfilador.etapa('ensaio.instanciar_condutivimetros', ensaio=self.caminho):
+                self._condutivimetros = [Condutivimetro(os.path.join(self.caminho, arquivo), janela_media_movel=self.janela_media_movel) for arquivo in lista_de_arquivos if padrao_csv.search(arquivo)]
+        # A lista de condutivímetros não muda depois de instanciada; o dicionário é montado uma única vez
+        self._condutivimetros_dict = {condutivimetro.eletrodo: condutivimetro for condutivimetro in self.condutivimetros}
     
-    def _obter_tempos_de_mistura(self):
+    def obter_tempos_de_mistura_por_porcentagem(self, porcentagens, todos=False):
         dados = self.obter_logaritmo_da_variancia(extendida=True)
-        numero_de_pontos = dados.shape[0]
-        tempos_de_mistura = list()
-        for i in range(numero_de_pontos):
-            if i == 0:
-                continue
+        with perfilador.etapa('ensaio.varredura_de_porcentagens', ensaio=self.ensaio) as etapa:
+            tempo = np.array(dados['tempo'])
+            logaritmo_da_variancia = np.array(dados['logaritmo_da_variancia'])
+            porcentagens = np.atleast_1d(np.asarray(porcentagens, dtype=float))
+            limites = __class__._obter_limite(porcentagens)
+            if todos:
+                cruzamentos = (logaritmo_da_variancia[1:, None] <= limites) & (logaritmo_da_variancia[:-1, None] > limites)
+                colunas, linhas = np.nonzero(cruzamentos.T)
+                indices = linhas + 1
+                ordem = np.concatenate([np.arange(contagem) for contagem in cruzamentos.sum(axis=0)]) + 1
+                tempos_de_mistura = pd.DataFrame({
+                    'Ensaio': self.numero_prefixo,
+                    'Porcentagem': porcentagens[colunas],
+                    'Limite': limites[colunas],
+                    'Cruzamento': ordem.astype(int),
+                    'Tempo de mistura [s]': tempo[indices],
+                    'Tempo de mistura [min]': tempo[indices] / 60,
+                    'Logaritmo da variância': logaritmo_da_variancia[indices],
+                })
             else:
-                if dados['logaritmo_da_variancia'][i] <= self.limite and dados['logaritmo_da_variancia'][i-1] > self.limite:
-                    tempos_de_mistura.append((dados['tempo'][i], dados['logaritmo_da_variancia'][i]))
+                indices = __class__._obter_primeiros_cruzamentos(logaritmo_da_variancia, limites)
+                tempos_de_mistura = pd.DataFrame({
+                    'Ensaio': self.numero_prefixo,
+                    'Porcentagem': porcentagens,
+                    'Limite': limites,
+                    'Tempo de mistura [s]': np.where(indices >= 0, tempo[indices], np.nan),
+                })
+                tempos_de_mistura['Tempo de mistura [min]'] = tempos_de_mistura['Tempo de mistura [s]'] / 60
+            etapa.linhas = logaritmo_da_variancia.size
+        return tempos_de_mistura
+
+    @staticmethod
+    def _obter_limite(porcentagem):
+        with np.errstate(divide='ignore'):
+            return np.log10((porcentagem/100 - 1)**2)
+
+    @staticmethod
+    def _obter_primeiros_cruzamentos(logaritmo_da_variancia, limites):
+        # O primeiro ponto em que o mínimo acumulado alcança cada limite é o primeiro cruzamento, desde que
+        # a curva comece acima do limite; os demais casos são resolvidos pela matriz de cruzamentos
+        minimos = np.fmin.accumulate(logaritmo_da_variancia)
+        indices = np.searchsorted(-minimos, -limites, side='left')
+        indices_anteriores = np.clip(indices - 1, 0, None)
+        validos = (indices > 0) & (indices < logaritmo_da_variancia.size)
+        validos[validos] = logaritmo_da_variancia[indices_anteriores[validos]] > limites[validos]
+        pendentes = ~validos & (minimos[-1] <= limites)
+        indices = np.where(validos, indices, -1)
+        if pendentes.any():
+            indices[pendentes] = _detectar_primeiro_cruzamento(logaritmo_da_variancia[:, None], limites[pendentes])
+        return indices
+
+    def obter_incerteza_tempo_de_mistura(self, metodo='bootstrap', numero_de_amostras=1000, confianca=95, semente=None):
+        tempo_de_mistura, amostras = self._obter_amostras_de_tempos_de_mistura(metodo, numero_de_amostras, semente)
+        return __class__._resumir_amostras_de_tempos_de_mistura(tempo_de_mistura, amostras, metodo, confianca)
+
+    def _obter_amostras_de_tempos_de_mistura(self, metodo='bootstrap', numero_de_amostras=1000, semente=None, tamanho_do_bloco=256):
+        dados = self.obter_condutividade_eletrica(normalizada=True, extendida=True)
+        with perfilador.etapa('ensaio.incerteza_tempo_de_mistura', ensaio=self.ensaio, metodo=metodo) as etapa:
+            tempo = np.array(dados['tempo'])
+            desvios = (np.array(dados.iloc[:, 1:]) - 1)**2
+            validos = ~np.isnan(desvios)
+            completos = validos.all()
+            desvios = np.where(validos, desvios, 0.0)
+            numero_de_eletrodos = desvios.shape[1]
+            if metodo == 'bootstrap':
+                gerador = np.random.default_rng(semente)
+                pesos = gerador.multinomial(numero_de_eletrodos, [1/numero_de_eletrodos]*numero_de_eletrodos, size=numero_de_amostras)
+            elif metodo == 'jackknife':
+                if numero_de_eletrodos < 2:
+                    raise ValueError('O método jackknife requer ao menos dois eletrodos')
+                pesos = 1 - np.eye(numero_de_eletrodos, dtype=int)
+            else:
+                raise ValueError(f'Método desconhecido: {metodo}')
+            # A primeira linha de pesos é o conjunto completo de eletrodos (estimativa pontual)
+            pesos = np.vstack([np.ones(numero_de_eletrodos, dtype=int), pesos])
+            matriz_de_pesos = (pesos / pesos.sum(axis=1, keepdims=True)).T
+            indices = list()
+            for inicio in range(0, pesos.shape[0], tamanho_do_bloco):
+                pesos_do_bloco = matriz_de_pesos[:, inicio:inicio + tamanho_do_bloco]
+                variancias = desvios @ pesos_do_bloco
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    if not completos:
+                        # Nas lacunas, cada reamostragem é ponderada somente pelos eletrodos com dados
+                        variancias = variancias / (validos @ pesos_do_bloco)
+                    logaritmo_da_variancia = np.log10(variancias)
+                indices.append(_detectar_primeiro_cruzamento(logaritmo_da_variancia, self.limite))
+            indices = np.concatenate(indices)
+            tempos_de_mistura = np.where(indices >= 0, tempo[indices], np.nan)
+            etapa.linhas = pesos.shape[0]
+        return tempos_de_mistura[0], tempos_de_mistura[1:]
+
+    @staticmethod
+    def _resumir_amostras_de_tempos_de_mistura(tempo_de_mistura, amostras, metodo, confianca, erro_padrao=None):
+        validas = amostras[~np.isnan(amostras)]
+        alfa = 1 - confianca/100
+        if metodo == 'bootstrap':
+            media = np.mean(validas) if validas.size else np.nan
+            desvio_padrao = np.std(validas, ddof=1) if validas.size > 1 else np.nan
+            limite_inferior, limite_superior = np.percentile(validas, [100*alfa/2, 100*(1 - alfa/2)]) if validas.size else (np.nan, np.nan)
+        else:
+            # Réplicas sem cruzamento do limite ficam de fora, como no bootstrap; o número delas aparece em 'Amostras válidas'
+            n = validas.size
+            media = np.mean(validas) if n else np.nan
+            if erro_padrao is None:
+                erro_padrao = np.sqrt((n - 1)/n * np.sum((validas - media)**2)) if n else np.nan
+            desvio_padrao = erro_padrao
+            z = NormalDist().inv_cdf(1 - alfa/2)
+            limite_inferior, limite_superior = tempo_de_mistura - z*erro_padrao, tempo_de_mistura + z*erro_padrao
+        return pd.Series({
+            'Tempo de mistura [s]': tempo_de_mistura,
+            'Média [s]': media,
+            'Desvio padrão [s]': desvio_padrao,
+            f'Limite inferior {confianca}% [s]': limite_inferior,
+            f'Limite superior {confianca}% [s]': limite_superior,
+            'Amostras válidas': validas.size,
+            'Amostras': amostras.size,
+        })
+
+    def _obter_tempos_de_mistura(self):
+        dados = self.obter_logaritmo_da_variancia(extendida=True)
+        with perfilador.etapa('ensaio.tempos_de_mistura', ensaio=self.ensaio) as etapa:
+            numero_de_pontos = dados.shape[0]
+            tempos_de_mistura = list()
+            for i in range(numero_de_pontos):
+                if i == 0:
+                    continue
+                else:
+                    if dados['logaritmo_da_variancia'][i] <= self.limite and dados['logaritmo_da_variancia'][i-1] > self.limite:
+                        tempos_de_mistura.append((dados['tempo'][i], dados['logaritmo_da_variancia'][i]))
+            etapa.linhas = numero_de_pontos
         return tempos_de_mistura
     
     def _corrigir_horarios_iniciais(self):
+        with perfilador.etapa('ensaio.correcao_horarios', ensaio=self.ensaio):
+            self._aplicar_correcao_horarios()
+
+    def _aplicar_correcao_horarios(self):
         dados = self._dados_correcao_horarios
         if type(dados) is list:
             dados = Experimento._importar_dados_do_google_sheets(*dados)
@@ -495,11 +1210,17 @@ Temperatura média: {self.temperatura_media:.1f} °C
 
 class Experimento:
 
-    def __init__(self, caminho, lista=None, dados_correcao_horarios=None, janela_media_movel=None):
+    def __init__(self, caminho, lista=None, dados_correcao_horarios=None, janela_media_movel=None, condutivimetros=None,
+                 reamostragem='automatica', intervalo_de_reamostragem=None, lacuna_maxima=None, preprocessamento=None):
         self._caminho = caminho
         self._lista = lista
         self._dados_correcao_horarios = dados_correcao_horarios
         self._janela_media_movel = janela_media_movel
+        self._condutivimetros_por_ensaio = condutivimetros
+        self._reamostragem = reamostragem
+        self._intervalo_de_reamostragem = intervalo_de_reamostragem
+        self._lacuna_maxima = lacuna_maxima
+        self._preprocessamento = preprocessamento
         self._instanciar_ensaios()
         self._redefinir_ids()
 
@@ -507,6 +1228,22 @@ class Experimento:
     def janela_media_movel(self):
         return self._janela_media_movel
 
+    @property
+    def reamostragem(self):
+        return self._reamostragem
+
+    @property
+    def intervalo_de_reamostragem(self):
+        return self._intervalo_de_reamostragem
+
+    @property
+    def lacuna_maxima(self):
+        return self._lacuna_maxima
+
+    @property
+    def preprocessamento(self):
+        return self._preprocessamento
+
     @property
     def caminho(self):
         return self._caminho
@@ -521,11 +1258,70 @@ class Experimento:
     
     @property
     def ensaios_dict(self):
-        return {ensaio.ensaio: ensaio for ensaio in self.ensaios}
+        return self._ensaios_dict
     
     def __getitem__(self, chave):
         return self.ensaios_dict[chave]
 
+    def aplicar_preprocessamento(self, preprocessamento=None):
+        # Cada ensaio guarda em cache o resultado de cada configuração; voltar a uma já usada não recalcula nada
+        with perfilador.etapa('experimento.preprocessamento', experimento=self.caminho):
+            for ensaio in self.ensaios:
+                ensaio.aplicar_preprocessamento(preprocessamento)
+        self._preprocessamento = preprocessamento
+
+    def consultar(self, ensaios=None, eletrodos=None, intervalo=None, filtro=None, consulta=None):
+        # Tabela longa, com uma linha por observação e chaves categóricas de ensaio e eletrodo.
+        # ensaios e eletrodos são listas de números; intervalo é (início, fim) em segundos sobre a coluna tempo;
+        # filtro recebe cada condutivímetro e devolve se ele entra; consulta é aplicada às linhas (DataFrame.query)
+        selecionados = [(ensaio, condutivimetro) for ensaio in self.ensaios if ensaios is None or ensaio.numero_prefixo in ensaios
+                        for condutivimetro in ensaio.condutivimetros
+                        if (eletrodos is None or condutivimetro.numero_eletrodo in eletrodos) and (filtro is None or filtro(condutivimetro))]
+        with perfilador.etapa('experimento.consulta', experimento=self.caminho) as etapa:
+            colunas = {'tempo': list(), 'horario': list(), 'condutividade_eletrica': list(), 'condutividade_eletrica_normalizada': list(), 'temperatura': list()}
+            tamanhos = list()
+            for _, condutivimetro in selecionados:
+                tempo = condutivimetro.tempo
+                if intervalo is None:
+                    inicio, fim = 0, tempo.size
+                else:
+                    inicio, fim = np.searchsorted(tempo, intervalo[0], side='left'), np.searchsorted(tempo, intervalo[1], side='right')
+                dados = condutivimetro.dados_tratados
+                colunas['tempo'].append(tempo[inicio:fim])
+                colunas['horario'].append(dados['horario'].to_numpy()[inicio:fim])
+                colunas['condutividade_eletrica'].append(condutivimetro.condutividade_eletrica[inicio:fim])
+                colunas['condutividade_eletrica_normalizada'].append(condutivimetro.condutividade_eletrica_normalizada[inicio:fim])
+                colunas['temperatura'].append(dados['temperatura'].to_numpy()[inicio:fim])
+                tamanhos.append(fim - inicio)
+            # Cada coluna é concatenada uma única vez; as chaves são códigos repetidos de categorias ordenadas
+            numeros_ensaios = [ensaio.numero_prefixo for ensaio, _ in selecionados]
+            numeros_eletrodos = [condutivimetro.numero_eletrodo for _, condutivimetro in selecionados]
+            categorias_ensaios = sorted(set(numeros_ensaios))
+            categorias_eletrodos = sorted(set(numeros_eletrodos))
+            dados = pd.DataFrame({
+                'ensaio': pd.Categorical.from_codes(np.repeat([categorias_ensaios.index(numero) for numero in numeros_ensaios], tamanhos).astype(int), categories=categorias_ensaios),
+                'eletrodo': pd.Categorical.from_codes(np.repeat([categorias_eletrodos.index(numero) for numero in numeros_eletrodos], tamanhos).astype(int), categories=categorias_eletrodos),
+                **{coluna: np.concatenate(valores) if valores else np.empty(0) for coluna, valores in colunas.items()},
+            })
+            if consulta is not None:
+                dados = dados.query(consulta).reset_index(drop=True)
+            etapa.linhas = dados.shape[0]
+        return dados
+
+    def agregar(self, colunas=None, estatisticas=None, por=None, **consulta):
+        # Estatísticas de toda a campanha em um único groupby sobre a tabela de consultar
+        if colunas is None:
+            colunas = ['condutividade_eletrica', 'temperatura']
+        if estatisticas is None:
+            estatisticas = ['mean', 'min', 'max', 'first', 'last']
+        if por is None:
+            por = ['ensaio', 'eletrodo']
+        dados = self.consultar(**consulta)
+        with perfilador.etapa('experimento.agregacao', experimento=self.caminho) as etapa:
+            agregados = dados.groupby(por, observed=True)[colunas].agg(estatisticas)
+            etapa.linhas = dados.shape[0]
+        return agregados
+
     def obter_tempos_de_mistura(self):
         tempos_de_mistura = pd.DataFrame()
         numero_ensaio = list()
@@ -540,26 +1336,119 @@ class Experimento:
         return tempos_de_mistura
 
     
-    def obter_resultados(self, diretorio='resultados', intervalo=None):
+    def obter_tempos_de_mistura_por_porcentagem(self, porcentagens, todos=False):
+        tempos_de_mistura = [ensaio.obter_tempos_de_mistura_por_porcentagem(porcentagens, todos) for ensaio in self.ensaios]
+        return pd.concat(tempos_de_mistura, ignore_index=True)
+
+    def obter_incerteza_tempos_de_mistura(self, metodo='bootstrap', numero_de_amostras=1000, confianca=95, semente=None):
+        gerador = np.random.default_rng(semente)
+        tempos_de_mistura, lista_de_amostras, incertezas = list(), list(), list()
+        for ensaio in self.ensaios:
+            tempo_de_mistura, amostras = ensaio._obter_amostras_de_tempos_de_mistura(metodo, numero_de_amostras, gerador)
+            tempos_de_mistura.append(tempo_de_mistura)
+            lista_de_amostras.append(amostras)
+            incertezas.append(Ensaio._resumir_amostras_de_tempos_de_mistura(tempo_de_mistura, amostras, metodo, confianca))
+        incertezas = pd.DataFrame(incertezas, index=pd.Index([ensaio.numero_prefixo for ensaio in self.ensaios], name='Ensaio'))
+        # Para o experimento: no bootstrap, cada reamostragem é a média dos ensaios na mesma iteração;
+        # no jackknife, os erros padrão dos ensaios são combinados como os de uma média
+        if metodo == 'bootstrap':
+            amostras_experimento = np.nanmean(np.vstack(lista_de_amostras), axis=0)
+            incerteza_experimento = Ensaio._resumir_amostras_de_tempos_de_mistura(np.nanmean(tempos_de_mistura), amostras_experimento, metodo, confianca)
+        else:
+            erro_padrao = np.sqrt(np.sum(np.array(incertezas['Desvio padrão [s]'])**2)) / len(self.ensaios)
+            incerteza_experimento = Ensaio._resumir_amostras_de_tempos_de_mistura(np.mean(tempos_de_mistura), np.concatenate(lista_de_amostras), metodo, confianca, erro_padrao)
+        incertezas.loc['Experimento'] = incerteza_experimento
+        incertezas['Amostras válidas'] = incertezas['Amostras válidas'].astype(int)
+        incertezas['Amostras'] = incertezas['Amostras'].astype(int)
+        return incertezas
+
+    def obter_resumo(self):
+        # Tabelas de eletrodos, ensaios e cruzamentos: as métricas dos eletrodos saem de um único groupby sobre
+        # a tabela de consultar e os tempos de mistura, da varredura vetorizada de cruzamentos de cada ensaio
+        with perfilador.etapa('experimento.resumo', experimento=self.caminho) as etapa:
+            dados = self.consultar()
+            agrupados = dados.groupby(['ensaio', 'eletrodo'], observed=True, sort=False)
+            dados['passo'] = agrupados['horario'].diff().dt.total_seconds()
+            metricas = dados.groupby(['ensaio', 'eletrodo'], observed=True, sort=False).agg(
+                numero_de_observacoes=('tempo', 'size'),
+                intervalo_de_tempo=('passo', 'median'),
+                condutividade_inicial=('condutividade_eletrica', 'first'),
+                condutividade_final=('condutividade_eletrica', 'last'),
+                condutividade_maxima=('condutividade_eletrica', 'max'),
+                temperatura_media=('temperatura', 'mean'),
+            ).reset_index().astype({'ensaio': int, 'eletrodo': int})
+            # Data e horários vêm dos dados originais, antes da correção de horários
+            identificacao = pd.DataFrame([{
+                'ensaio': ensaio.numero_prefixo,
+                'eletrodo': condutivimetro.numero_eletrodo,
+                'prefixo': condutivimetro.prefixo,
+                'arquivo': condutivimetro.arquivo,
+                'data': condutivimetro.data,
+                'horario_de_inicio': condutivimetro.horario_de_inicio,
+                'horario_de_termino': condutivimetro.horario_de_termino,
+            } for ensaio in self.ensaios for condutivimetro in ensaio.condutivimetros])
+            eletrodos = identificacao.merge(metricas, on=['ensaio', 'eletrodo'], how='left')
+            cruzamentos = pd.concat([ensaio.obter_tempos_de_mistura_por_porcentagem(ensaio.porcentagem, todos=True) for ensaio in self.ensaios], ignore_index=True)
+            ensaios = pd.DataFrame({
+                'ensaio': [ensaio.numero_prefixo for ensaio in self.ensaios],
+                'prefixo': [ensaio.prefixo for ensaio in self.ensaios],
+                'numero_de_eletrodos': [len(ensaio.condutivimetros) for ensaio in self.ensaios],
+                'porcentagem': [ensaio.porcentagem for ensaio in self.ensaios],
+                'limite': [ensaio.limite for ensaio in self.ensaios],
+            })
+            primeiros_cruzamentos = cruzamentos[cruzamentos['Cruzamento'] == 1].set_index('Ensaio')['Tempo de mistura [s]']
+            ensaios['tempo_de_mistura'] = ensaios['ensaio'].map(primeiros_cruzamentos)
+            ensaios['numero_de_cruzamentos'] = ensaios['ensaio'].map(cruzamentos.groupby('Ensaio').size()).fillna(0).astype(int)
+            ensaios['temperatura_media'] = ensaios['ensaio'].map(eletrodos.groupby('ensaio')['temperatura_media'].mean())
+            etapa.linhas = dados.shape[0]
+        return {'ensaios': ensaios, 'eletrodos': eletrodos, 'cruzamentos': cruzamentos}
+
+    def exportar_resumo(self, diretorio, formatos=None, resumo=None):
+        if resumo is None:
+            resumo = self.obter_resumo()
+        os.makedirs(diretorio, exist_ok=True)
+        for nome, tabela in resumo.items():
+            _salvar_tabela(tabela, diretorio, f'tab_resumo_{nome}', formatos)
+
+    def renderizar_relatorio(self, resumo=None):
+        # O texto é montado a partir das tabelas do resumo, sem imprimir nem recalcular nada por objeto
+        if resumo is None:
+            resumo = self.obter_resumo()
+        cruzamentos = resumo['cruzamentos'].groupby('Ensaio')['Tempo de mistura [s]']
+        eletrodos = resumo['eletrodos'].groupby('ensaio', sort=False)
+        partes = ['RELATÓRIO DO EXPERIMENTO\n']
+        for linha in resumo['ensaios'].to_dict('records'):
+            tempos_de_mistura = list(cruzamentos.get_group(linha['ensaio'])) if linha['numero_de_cruzamentos'] else list()
+            partes.append('\n' + '-' * 80 + f' {linha["ensaio"]:02}' + '\n')
+            partes.append(Ensaio._formatar_relatorio(linha, tempos_de_mistura))
+            for eletrodo in eletrodos.get_group(linha['ensaio']).to_dict('records'):
+                partes.append(Condutivimetro._formatar_relatorio(eletrodo))
+        return ''.join(partes)
+
+    def obter_resultados(self, diretorio='resultados', intervalo=None, formatos=None, formatos_de_tabela=None, figuras=True):
+        with perfilador.etapa('experimento.resultados', experimento=self.caminho):
+            self._gerar_resultados(diretorio, intervalo, formatos, formatos_de_tabela, figuras)
+
+    def _gerar_resultados(self, diretorio, intervalo, formatos, formatos_de_tabela, figuras):
         diretorio_resultados = os.path.join(self.caminho, diretorio)
-        diretorio_figuras = os.path.join(diretorio_resultados, 'figuras')
         if os.path.exists(diretorio_resultados):
             shutil.rmtree(diretorio_resultados)
-        os.mkdir(diretorio_resultados)
-        os.mkdir(diretorio_figuras)
-        self.plotar_logaritmo_da_variancia(salvar=True, caminho=diretorio_figuras, intervalo=intervalo)
+        os.makedirs(diretorio_resultados)
+        if figuras:
+            diretorio_figuras = os.path.join(diretorio_resultados, 'figuras')
+            os.mkdir(diretorio_figuras)
+            self.plotar_logaritmo_da_variancia(salvar=True, caminho=diretorio_figuras, intervalo=intervalo, formatos=formatos)
+            # As figuras por ensaio reaproveitam os mesmos dois modelos, trocando apenas os dados das curvas
+            with ModeloDeFigura() as modelo_condutividade, ModeloDeFigura() as modelo_variancia:
+                for ensaio in self.ensaios:
+                    ensaio.plotar_condutividade_eletrica(normalizada=True, salvar=True, caminho=diretorio_figuras, modelo=modelo_condutividade, formatos=formatos)
+                    ensaio.plotar_logaritmo_da_variancia(salvar=True, caminho=diretorio_figuras, intervalo=intervalo, modelo=modelo_variancia, formatos=formatos)
+        resumo = self.obter_resumo()
+        self.exportar_resumo(diretorio_resultados, formatos_de_tabela, resumo)
         with open(os.path.join(diretorio_resultados, 'relatorio.txt'), 'w') as arquivo_relatorio:
-            arquivo_relatorio.write('RELATÓRIO DO EXPERIMENTO\n')
-            for ensaio in self.ensaios:
-                ensaio.plotar_condutividade_eletrica(normalizada=True, salvar=True, caminho=diretorio_figuras)
-                ensaio.plotar_logaritmo_da_variancia(salvar=True, caminho=diretorio_figuras, intervalo=intervalo)
-                arquivo_relatorio.write('\n' + '-' * 80 + f' {ensaio.numero_prefixo:02}' + '\n')
-                arquivo_relatorio.write(ensaio.imprimir_relatorio())
-                for eletrodo in ensaio.condutivimetros:
-                    arquivo_relatorio.write(eletrodo.imprimir_relatorio())
-        arquivo_relatorio.close()
-
-    def plotar_condutividade_eletrica(self, combinacao, normalizada=False, extendida=False, salvar=False, intervalo=None, caminho=None, nome_do_arquivo=None):
+            arquivo_relatorio.write(self.renderizar_relatorio(resumo))
+
+    def plotar_condutividade_eletrica(self, combinacao, normalizada=False, extendida=False, salvar=False, intervalo=None, caminho=None, nome_do_arquivo=None, modelo=None, formatos=None):
         if normalizada:
             eixo_y = 'Condutividade elétrica normalizada'
             limite_y = [0, 2]
@@ -570,109 +1459,91 @@ class Experimento:
             limite_y = None
             if nome_do_arquivo is None:
                 nome_do_arquivo = f'fig_gr_perfil_de_condutividade_eletrica'
-        lista_de_tempos = list()
-        fig, ax = plt.subplots(figsize=(7, 3.5))
+        curvas = list()
         for ensaio in combinacao:
             for eletrodo in combinacao[ensaio]:
-                condutividade = self[f'ensaio_{ensaio}'][f'eletrodo_{eletrodo}'].obter_condutividade_eletrica(normalizada)
-                tempo = self[f'ensaio_{ensaio}'][f'eletrodo_{eletrodo}'].tempo
-                lista_de_tempos.append(tempo[-1])
-                ax.plot(tempo / 60, condutividade,
-                        label=f'Ens. {ensaio} - El. {eletrodo}'
-                        )
-        tempo_maximo = max(lista_de_tempos)
-        if normalizada:
-            ax.fill_between([0, tempo_maximo/60] if intervalo is None else intervalo,
-                            [0.95, 0.95], [1.05, 1.05], color='gray', alpha=0.25)
-        ax.set_title(f'Perfil de condutividade elétrica')
-        ax.set_xlabel('Tempo [min]')
-        ax.set_ylabel(eixo_y)
-        ax.set_xlim([0, 15*((tempo_maximo/60)//15)]) if intervalo is None else ax.set_xlim(intervalo)
-        ax.set_ylim(limite_y)
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
-        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize='x-small')
-        plt.tight_layout()
-        if salvar:
-            if caminho is None:
-                caminho = self.caminho
-            else:
-                caminho = caminho
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.png'))
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.pdf'))
-            plt.close()
-        else:
-            plt.show()
-
-    def plotar_logaritmo_da_variancia(self, extendida=False, salvar=False, intervalo=None, caminho=None):
-        fig, ax = plt.subplots()
-        # fig, ax = plt.subplots(figsize=(7, 3.5))
-        lista_de_tempos = list()
+                condutivimetro = self[f'ensaio_{ensaio}'][f'eletrodo_{eletrodo}']
+                curvas.append({'x': condutivimetro.tempo / 60, 'y': condutivimetro.obter_condutividade_eletrica(normalizada),
+                               'label': f'Ens. {ensaio} - El. {eletrodo}', 'color': f'C{len(curvas) % 9}'})
+        tempo_maximo = max(curva['x'][-1] for curva in curvas)
+        figura = ModeloDeFigura(figsize=(7, 3.5)) if modelo is None else modelo
+        figura.atualizar(curvas,
+                         titulo='Perfil de condutividade elétrica',
+                         eixo_x='Tempo [min]', eixo_y=eixo_y,
+                         limite_x=[0, 15*(tempo_maximo//15)] if intervalo is None else intervalo, limite_y=limite_y,
+                         localizador_x=5,
+                         faixa=([0, tempo_maximo] if intervalo is None else intervalo, [0.95, 0.95], [1.05, 1.05]) if normalizada else None,
+                         legenda={'loc': 'center left', 'bbox_to_anchor': (1, 0.5), 'fontsize': 'x-small'})
+        figura.fig.tight_layout()
+        if caminho is None:
+            caminho = self.caminho
+        _finalizar_figura(figura, modelo, salvar, caminho, nome_do_arquivo, formatos)
+
+    def plotar_logaritmo_da_variancia(self, extendida=False, salvar=False, intervalo=None, caminho=None, modelo=None, formatos=None):
+        curvas = list()
         for ensaio in self.ensaios:
             dados = ensaio.obter_logaritmo_da_variancia(extendida)
-            logaritmo_da_variancia = np.array(dados['logaritmo_da_variancia'])
-            tempo = np.array(dados['tempo'])
-            lista_de_tempos.append(tempo[-1])
+            curvas.append({'x': np.array(dados['tempo']) / 60, 'y': np.array(dados['logaritmo_da_variancia']),
+                           'color': f'C{ensaio.color_id}', 'ls': dashes[ensaio.ls_id],
+                           'label': f'{ensaio.prefixo} {ensaio.numero_prefixo}'})
             limite, porcentagem = ensaio.limite, ensaio.porcentagem
-            ax.plot(tempo / 60, logaritmo_da_variancia,
-                color=f'C{ensaio.color_id}',
-                ls=dashes[ensaio.ls_id],
-                label=f'{ensaio.prefixo} {ensaio.numero_prefixo}')
-        tempo_maximo = max(lista_de_tempos)
-        # Refatorar as duas linhas a baixo, pois pega limite e porcentagem do último ensaio
-        ax.plot([0, tempo_maximo/60] if intervalo is None else intervalo,
-                [limite]*2, color='gray', ls='--')
-        ax.text(0, limite, f'{porcentagem}\\%: {limite:.2f}', color='gray', fontsize='xx-small')
-        ax.set_title('Logaritmo da variância RMS por tempo')
-        ax.set_xlabel('Tempo [min]')
-        ax.set_ylabel('Logaritmo da variância RMS da\ncondutividade elétrica normalizada')
-        ax.set_ylim([-6, 2])
-        ax.set_xlim([0, 15*((tempo_maximo/60)//15)]) if intervalo is None else ax.set_xlim(intervalo)
-        ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
-        # ax.grid(which='minor')
-        ax.legend()
-        # ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-        plt.tight_layout()
-        if salvar:
-            nome_do_arquivo = f'fig_gr_logaritmo_da_variancia'
-            if caminho is None:
-                caminho = self.caminho
-            else:
-                caminho = caminho
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.png'))
-            fig.savefig(os.path.join(caminho, f'{nome_do_arquivo}.pdf'))
-            plt.close()
-        else:
-            plt.show()
+        tempo_maximo = max(curva['x'][-1] for curva in curvas)
+        # Refatorar a referência, pois pega limite e porcentagem do último ensaio
+        figura = ModeloDeFigura() if modelo is None else modelo
+        figura.atualizar(curvas,
+                         titulo='Logaritmo da variância RMS por tempo',
+                         eixo_x='Tempo [min]', eixo_y='Logaritmo da variância RMS da\ncondutividade elétrica normalizada',
+                         limite_x=[0, 15*(tempo_maximo//15)] if intervalo is None else intervalo, limite_y=[-6, 2],
+                         localizador_x=5,
+                         referencia=([0, tempo_maximo] if intervalo is None else intervalo, limite, f'{porcentagem}\\%: {limite:.2f}'))
+        figura.fig.tight_layout()
+        if caminho is None:
+            caminho = self.caminho
+        _finalizar_figura(figura, modelo, salvar, caminho, 'fig_gr_logaritmo_da_variancia', formatos)
     
-    def combinar_ensaios(self, dados, prefixo='ensaio', diretorio='ensaios_novo', colunas=None, lista=None, dados_correcao_horarios=None, janela_media_movel=None):
+    def combinar_ensaios(self, dados, prefixo='ensaio', diretorio='ensaios_novo', colunas=None, lista=None, dados_correcao_horarios=None, janela_media_movel=None, materializar=True,
+                         reamostragem='automatica', intervalo_de_reamostragem=None, lacuna_maxima=None, preprocessamento=None):
+        # O novo experimento é montado a partir dos condutivímetros já carregados, sem reler os arquivos;
+        # com materializar=True os arquivos também são vinculados (hardlink, symlink ou cópia) em diretorio
         if type(dados) is list:
             dados = __class__._importar_dados_do_google_sheets(*dados)
         if colunas is None:
             colunas = ['ensaio_antigo', 'ensaio_novo', 'eletrodos_antigo', 'eletrodos_novo']
         diretorio = os.path.join(self.caminho, diretorio)
-        if os.path.exists(diretorio):
-            shutil.rmtree(diretorio)
-        os.mkdir(diretorio)
-        for i in dados.index:
-            ensaio_antigo = f'{prefixo}_{dados[colunas[0]][i]}'
-            ensaio_novo = f'{prefixo}_{dados[colunas[1]][i]}'
-            eletrodos_antigo = dados[colunas[2]][i].split('_')
-            eletrodos_antigo = [f'eletrodo_{eletrodo_antigo}' for eletrodo_antigo in eletrodos_antigo]
-            eletrodos_novo = dados[colunas[3]][i].split('_')
-            eletrodos_novo = [f'eletrodo_{eletrodo_novo}' for eletrodo_novo in eletrodos_novo]
-            diretorio_ensaio_antigo = self[ensaio_antigo].caminho
-            diretorio_ensaio_novo = os.path.join(diretorio, ensaio_novo)
-            if ensaio_antigo in self.ensaios_dict:
-                if not os.path.exists(diretorio_ensaio_novo):
-                    os.mkdir(diretorio_ensaio_novo)
-                for eletrodo_antigo, eletrodo_novo in zip(eletrodos_antigo, eletrodos_novo):
-                    arquivo_antigo = os.path.join(diretorio_ensaio_antigo, f'{ensaio_antigo}_{eletrodo_antigo}.csv')
-                    arquivo_novo = os.path.join(diretorio_ensaio_novo, f'{ensaio_novo}_{eletrodo_novo}.csv')
-                    shutil.copy(arquivo_antigo, arquivo_novo)
-        return __class__(diretorio, lista=lista, dados_correcao_horarios=dados_correcao_horarios, janela_media_movel=janela_media_movel)
+        if materializar:
+            if os.path.exists(diretorio):
+                shutil.rmtree(diretorio)
+            os.mkdir(diretorio)
+        condutivimetros = dict()
+        with perfilador.etapa('experimento.combinar_ensaios', experimento=self.caminho):
+            for i in dados.index:
+                ensaio_antigo = f'{prefixo}_{dados[colunas[0]][i]}'
+                ensaio_novo = f'{prefixo}_{dados[colunas[1]][i]}'
+                eletrodos_antigo = str(dados[colunas[2]][i]).split('_')
+                eletrodos_antigo = [f'eletrodo_{eletrodo_antigo}' for eletrodo_antigo in eletrodos_antigo]
+                eletrodos_novo = str(dados[colunas[3]][i]).split('_')
+                eletrodos_novo = [f'eletrodo_{eletrodo_novo}' for eletrodo_novo in eletrodos_novo]
+                diretorio_ensaio_novo = os.path.join(diretorio, ensaio_novo)
+                if ensaio_antigo in self.ensaios_dict:
+                    if materializar and not os.path.exists(diretorio_ensaio_novo):
+                        os.mkdir(diretorio_ensaio_novo)
+                    condutivimetros_ensaio_novo = condutivimetros.setdefault(ensaio_novo, dict())
+                    for eletrodo_antigo, eletrodo_novo in zip(eletrodos_antigo, eletrodos_novo):
+                        condutivimetro_antigo = self[ensaio_antigo][eletrodo_antigo]
+                        arquivo_novo = os.path.join(diretorio_ensaio_novo, f'{ensaio_novo}_{eletrodo_novo}.csv')
+                        if materializar:
+                            __class__._vincular_arquivo(condutivimetro_antigo.caminho, arquivo_novo)
+                        condutivimetros_ensaio_novo[arquivo_novo] = Condutivimetro(arquivo_novo, janela_media_movel=janela_media_movel, origem=condutivimetro_antigo)
+        condutivimetros = {ensaio: list(condutivimetros_ensaio.values()) for ensaio, condutivimetros_ensaio in condutivimetros.items()}
+        return __class__(diretorio, lista=lista, dados_correcao_horarios=dados_correcao_horarios, janela_media_movel=janela_media_movel, condutivimetros=condutivimetros,
+                         reamostragem=reamostragem, intervalo_de_reamostragem=intervalo_de_reamostragem, lacuna_maxima=lacuna_maxima,
+                         preprocessamento=preprocessamento)
 
     def _obter_lista_de_ensaios(self):
-        lista_de_diretorios = os.listdir(self.caminho)
+        if self._condutivimetros_por_ensaio is None:
+            lista_de_diretorios = os.listdir(self.caminho)
+        else:
+            lista_de_diretorios = list(self._condutivimetros_por_ensaio)
         lista_de_ensaios = list()
         for ensaio in lista_de_diretorios:
             if padrao_diretorio.search(ensaio):
@@ -686,13 +1557,29 @@ class Experimento:
     
     def _instanciar_ensaios(self):
         lista_de_ensaios = self._obter_lista_de_ensaios()
-        self._ensaios = [Ensaio(os.path.join(self.caminho, diretorio), dados_correcao_horarios=self._dados_correcao_horarios, janela_media_movel=self.janela_media_movel) for diretorio in lista_de_ensaios]
+        with perfilador.etapa('experimento.instanciar_ensaios', experimento=self.caminho):
+            self._ensaios = [Ensaio(os.path.join(self.caminho, diretorio), dados_correcao_horarios=self._dados_correcao_horarios, janela_media_movel=self.janela_media_movel,
+                                    condutivimetros=None if self._condutivimetros_por_ensaio is None else self._condutivimetros_por_ensaio[diretorio],
+                                    reamostragem=self.reamostragem, intervalo_de_reamostragem=self.intervalo_de_reamostragem, lacuna_maxima=self.lacuna_maxima,
+                                    preprocessamento=self.preprocessamento)
+                             for diretorio in lista_de_ensaios]
+        self._ensaios_dict = {ensaio.ensaio: ensaio for ensaio in self.ensaios}
 
     def _redefinir_ids(self):
         for id, ensaio in enumerate(self.ensaios):
             ensaio.color_id = id % 8
             ensaio.ls_id = id // 8
 
+    @staticmethod
+    def _vincular_arquivo(arquivo_antigo, arquivo_novo):
+        try:
+            os.link(arquivo_antigo, arquivo_novo)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(arquivo_antigo), arquivo_novo)
+            except OSError:
+                shutil.copy(arquivo_antigo, arquivo_novo)
+
     @staticmethod
     def _importar_dados_do_google_sheets(url_planilha, aba_planilha):
         id_planilha = re.search('https://docs.google.com/spreadsheets/d/(.*)/', url_planilha).group(1)
@@ -758,7 +1645,8 @@ class Torquimetro:
             selecao = (self.dados_tratados['tempo'] >= 60 * intervalo[0]) & (self.dados_tratados['tempo'] <= 60 * intervalo[1])
             return self.dados_tratados[selecao]['potencia'].mean()
         
-    def plotar_graficos(self, salvar=False, caminho=None):
+    def plotar_graficos(self, salvar=False, caminho=None, formatos=None):
+        plt, ticker = configurar_graficos()
         fig, axs = plt.subplots(2, 1)
         if self.janela_media_movel is None:
             axs[0].plot(self.dados_tratados['tempo'] / 60, self.dados_tratados['torque'], color='C0')
@@ -785,9 +1673,8 @@ class Torquimetro:
                 caminho = self.caminho
             else:
                 caminho = caminho
-            fig.savefig(os.path.join(caminho, f'fig_gr_{self.numero_prefixo}_torque_e_potencia.png'))
-            fig.savefig(os.path.join(caminho, f'fig_gr_{self.numero_prefixo}_torque_e_potencia.pdf'))
-            plt.close()
+            _salvar_figura(fig, caminho, f'fig_gr_{self.numero_prefixo}_torque_e_potencia', formatos)
+            plt.close(fig)
         else:
             plt.show()
 
@@ -801,9 +1688,15 @@ class Torquimetro:
             pass
         
     def _obter_base_de_dados(self):
-        self._dados_originais = pd.read_excel(self.caminho, sheet_name=0, header=2, decimal=',')
+        with perfilador.etapa('torquimetro.leitura_excel', arquivo=self.caminho) as etapa:
+            self._dados_originais = pd.read_excel(self.caminho, sheet_name=0, header=2, decimal=',')
+            etapa.linhas = self._dados_originais.shape[0]
         
     def _tratar_base_de_dados(self):
+        with perfilador.etapa('torquimetro.tratamento', arquivo=self.caminho):
+            self._tratar_dados_do_torquimetro()
+
+    def _tratar_dados_do_torquimetro(self):
         dados = self.dados_originais.copy()
         colunas_renomeadas = ['velocidade', 'torque', 'tempo', 'potencia']
         colunas_mapeadas = {coluna: coluna_renomeada for coluna, coluna_renomeada in zip(dados.columns, colunas_renomeadas)}
@@ -815,14 +1708,312 @@ class Torquimetro:
         if type(self.janela_media_movel) is int and self.janela_media_movel != 0:
             self._dados_tratados[['torque_media_movel', 'potencia_media_movel']] = self._dados_tratados[['torque', 'potencia']].rolling(self.janela_media_movel, min_periods=1).mean()
 
-class Simulacao:
+class MonitorDeConvergencia:
+
+    def __init__(self, janela=500, limite_residuos=1e-3, tolerancia_plato=0.05, tolerancia_deriva=1e-3, tolerancia_oscilacao=1e-3):
+        self._janela = janela
+        self._limite_residuos = limite_residuos
+        self._tolerancia_plato = tolerancia_plato
+        self._tolerancia_deriva = tolerancia_deriva
+        self._tolerancia_oscilacao = tolerancia_oscilacao
+        self._colunas = None
+        self._ultima_iteracao = None
+        self._numero_de_iteracoes = 0
+
+    @property
+    def janela(self):
+        return self._janela
+
+    @property
+    def colunas(self):
+        return self._colunas
+
+    @property
+    def colunas_residuos(self):
+        return [coluna for coluna in self.colunas if coluna in colunas_residuos_outputlog]
+
+    @property
+    def colunas_reports(self):
+        return [coluna for coluna in self.colunas if coluna not in colunas_residuos_outputlog]
+
+    @property
+    def ultima_iteracao(self):
+        return self._ultima_iteracao
+
+    @property
+    def numero_de_iteracoes(self):
+        return self._numero_de_iteracoes
+
+    @property
+    def janela_completa(self):
+        return self._numero_de_iteracoes >= self.janela
+
+    @property
+    def convergiu(self):
+        if self.colunas is None or not self.janela_completa:
+            return False
+        estatisticas = self.obter_estatisticas()
+        residuos = estatisticas.loc[self.colunas_residuos]
+        reports = estatisticas.loc[self.colunas_reports]
+        residuos_convergidos = ((residuos['ultimo'] <= self._limite_residuos) | residuos['plato']).all()
+        oscilacao = reports['desvio_padrao'] / reports['media'].abs()
+        reports_convergidos = ((reports['deriva'].abs() <= self._tolerancia_deriva) & (oscilacao <= self._tolerancia_oscilacao)).all()
+        return bool(residuos_convergidos and reports_convergidos)
+
+    def atualizar(self, outputlog):
+        # Cada iteração entra na janela e a mais antiga sai: as somas acumuladas são atualizadas em O(1)
+        # por iteração, sem percorrer o histórico
+        if self._colunas is None:
+            self._iniciar([coluna for coluna in outputlog.columns if coluna != 'iter'])
+        if self._ultima_iteracao is not None:
+            outputlog = outputlog[outputlog['iter'] > self._ultima_iteracao]
+        if outputlog.shape[0] == 0:
+            return self
+        with perfilador.etapa('monitor.atualizacao') as etapa:
+            iteracoes = np.array(outputlog['iter'], dtype='float64')
+            valores = np.array(outputlog.reindex(columns=self.colunas), dtype='float64')
+            valores[:, self._indices_residuos] = np.log10(np.clip(valores[:, self._indices_residuos], 1e-300, None))
+            for iteracao, linha in zip(iteracoes, valores):
+                self._adicionar(iteracao, linha)
+            self._ultima_iteracao = int(iteracoes[-1])
+            etapa.linhas = iteracoes.size
+        return self
+
+    def obter_estatisticas(self):
+        n = min(self._numero_de_iteracoes, self.janela)
+        if n == 0:
+            return pd.DataFrame(index=pd.Index(self.colunas or [], name='variavel'))
+        media = self._soma_y / n
+        variancia = (self._soma_y2 - n * media**2) / (n - 1) if n > 1 else np.zeros_like(media)
+        denominador = n * self._soma_x2 - self._soma_x**2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inclinacao = (n * self._soma_xy - self._soma_x * self._soma_y) / denominador
+        extensao = self._iteracoes[self._posicao - 1] - self._iteracoes[(self._posicao - n) % self.janela]
+        ultimo = self._valores[self._posicao - 1].copy()
+        residuos = self._indices_residuos
+        ultimo[residuos] = 10**ultimo[residuos]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deriva = inclinacao * extensao / np.abs(media)
+        # Resíduos são acompanhados em log10: média e desvio em décadas, inclinação em décadas por
+        # iteração e deriva em décadas ao longo da janela; nos reports a deriva é relativa à média
+        deriva[residuos] = inclinacao[residuos] * extensao
+        plato = np.zeros(len(self.colunas), dtype=bool)
+        plato[residuos] = (np.abs(deriva[residuos]) <= self._tolerancia_plato) & (n >= self.janela)
+        estatisticas = pd.DataFrame({
+            'tipo': np.where(np.isin(np.arange(len(self.colunas)), residuos), 'residuo', 'report'),
+            'ultimo': ultimo,
+            'media': media,
+            'desvio_padrao': np.sqrt(np.clip(variancia, 0, None)),
+            'inclinacao': inclinacao,
+            'deriva': deriva,
+            'plato': plato,
+        }, index=pd.Index(self.colunas, name='variavel'))
+        return estatisticas
+
+    def _iniciar(self, colunas):
+        self._colunas = colunas
+        self._indices_residuos = [i for i, coluna in enumerate(colunas) if coluna in colunas_residuos_outputlog]
+        self._iteracoes = np.zeros(self.janela)
+        self._valores = np.zeros((self.janela, len(colunas)))
+        self._posicao = 0
+        self._origem = None
+        self._zerar_somas()
+
+    def _zerar_somas(self):
+        self._soma_x = 0.0
+        self._soma_x2 = 0.0
+        self._soma_y = np.zeros(len(self.colunas))
+        self._soma_y2 = np.zeros(len(self.colunas))
+        self._soma_xy = np.zeros(len(self.colunas))
+
+    def _adicionar(self, iteracao, linha):
+        if self._origem is None:
+            self._origem = iteracao
+        x = iteracao - self._origem
+        if self._numero_de_iteracoes >= self.janela:
+            x_antigo = self._iteracoes[self._posicao] - self._origem
+            y_antigo = self._valores[self._posicao]
+            self._soma_x -= x_antigo
+            self._soma_x2 -= x_antigo**2
+            self._soma_y -= y_antigo
+            self._soma_y2 -= y_antigo**2
+            self._soma_xy -= x_antigo * y_antigo
+        self._iteracoes[self._posicao] = iteracao
+        self._valores[self._posicao] = linha
+        self._soma_x += x
+        self._soma_x2 += x**2
+        self._soma_y += linha
+        self._soma_y2 += linha**2
+        self._soma_xy += x * linha
+        self._posicao = (self._posicao + 1) % self.janela
+        self._numero_de_iteracoes += 1
+        # A cada volta completa da janela as somas são refeitas a partir do buffer, limitando o erro acumulado
+        if self._posicao == 0:
+            self._recalcular_somas()
+
+    def _recalcular_somas(self):
+        x = self._iteracoes - self._origem
+        self._soma_x = x.sum()
+        self._soma_x2 = (x**2).sum()
+        self._soma_y = self._valores.sum(axis=0)
+        self._soma_y2 = (self._valores**2).sum(axis=0)
+        self._soma_xy = x @ self._valores
+
+
+class HistoricoOutputlog:
+
+    # Cabeçalho: assinatura, versão, número de colunas, tamanho do cabeçalho e, em JSON, os nomes das colunas
+    # e o mapeamento de colunas usado na leitura, completado com espaços até um múltiplo de 8 bytes;
+    # em seguida, registros float64 de largura fixa. As posições já lidas de cada log ficam em um JSON ao lado
+    assinatura = b'HISTLOG\x00'
+    versao = 2
+    formato_cabecalho = '<8sIIQ'
 
     def __init__(self, caminho):
         self._caminho = caminho
+        self._colunas = None
+        self._mapeamento_colunas = None
+        self._versao = None
+        self._tamanho_do_cabecalho = None
+        if self.existe:
+            self._ler_cabecalho()
+
+    @property
+    def caminho(self):
+        return self._caminho
+
+    @property
+    def caminho_posicoes(self):
+        return f'{os.path.splitext(self.caminho)[0]}_posicoes.json'
+
+    @property
+    def existe(self):
+        return os.path.exists(self.caminho)
+
+    @property
+    def colunas(self):
+        return self._colunas
+
+    @property
+    def mapeamento_colunas(self):
+        return self._mapeamento_colunas
+
+    @property
+    def posicoes(self):
+        # {arquivo: [posição em bytes, colunas]} de cada log, como em Simulacao._ler_trecho_novo_outputlog
+        if not os.path.exists(self.caminho_posicoes):
+            return dict()
+        with open(self.caminho_posicoes, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+
+    def compativel(self, mapeamento_colunas):
+        # Históricos de outra versão ou lidos com outro mapeamento de colunas estão desatualizados
+        return self.existe and self._versao == __class__.versao and \
+               __class__._serializar_mapeamento(self.mapeamento_colunas) == __class__._serializar_mapeamento(mapeamento_colunas)
+
+    @property
+    def numero_de_registros(self):
+        if not self.existe or self.colunas is None:
+            return 0
+        return (os.path.getsize(self.caminho) - self._tamanho_do_cabecalho) // (8 * len(self.colunas))
+
+    @property
+    def ultima_iteracao(self):
+        if self.numero_de_registros == 0:
+            return None
+        return int(self.ler()[-1, self.colunas.index('iter')])
+
+    def criar(self, colunas, mapeamento_colunas=None):
+        colunas_json = json.dumps({'colunas': list(colunas), 'mapeamento_colunas': mapeamento_colunas}).encode('utf-8')
+        tamanho_do_cabecalho = struct.calcsize(__class__.formato_cabecalho) + len(colunas_json)
+        tamanho_do_cabecalho += -tamanho_do_cabecalho % 8
+        cabecalho = struct.pack(__class__.formato_cabecalho, __class__.assinatura, __class__.versao, len(colunas), tamanho_do_cabecalho)
+        with open(self.caminho, 'wb') as arquivo:
+            arquivo.write(cabecalho + colunas_json.ljust(tamanho_do_cabecalho - len(cabecalho)))
+        self._colunas = list(colunas)
+        self._mapeamento_colunas = json.loads(json.dumps(mapeamento_colunas))
+        self._versao = __class__.versao
+        self._tamanho_do_cabecalho = tamanho_do_cabecalho
+        self.salvar_posicoes(dict())
+
+    def salvar_posicoes(self, posicoes):
+        with open(self.caminho_posicoes, 'w', encoding='utf-8') as arquivo:
+            json.dump(posicoes, arquivo)
+
+    def anexar(self, dados):
+        registros = np.ascontiguousarray(dados.reindex(columns=self.colunas), dtype='<f8')
+        with perfilador.etapa('historico.anexar', arquivo=self.caminho) as etapa:
+            with open(self.caminho, 'ab') as arquivo:
+                arquivo.write(registros.tobytes())
+            etapa.linhas = registros.shape[0]
+        return registros.shape[0]
+
+    def ler(self, colunas=None, iteracoes=None):
+        # Devolve uma visão do arquivo mapeado em memória, sem cópia (a seleção de várias colunas é copiada);
+        # registros incompletos no fim do arquivo são ignorados
+        if isinstance(colunas, str):
+            colunas = [colunas]
+        numero_de_registros = self.numero_de_registros
+        if numero_de_registros == 0:
+            return np.empty((0, len(self.colunas or []) if colunas is None else len(colunas)))
+        registros = np.memmap(self.caminho, dtype='<f8', mode='r', offset=self._tamanho_do_cabecalho,
+                              shape=(numero_de_registros, len(self.colunas)))
+        if iteracoes is not None:
+            iteracao = registros[:, self.colunas.index('iter')]
+            inicio = 0 if iteracoes[0] is None else np.searchsorted(iteracao, iteracoes[0], side='left')
+            fim = numero_de_registros if iteracoes[1] is None else np.searchsorted(iteracao, iteracoes[1], side='right')
+            registros = registros[inicio:fim]
+        if colunas is not None:
+            indices = [self.colunas.index(coluna) for coluna in colunas]
+            registros = registros[:, indices[0]] if len(indices) == 1 else registros[:, indices]
+        return registros
+
+    def obter_dados(self, colunas=None, iteracoes=None):
+        colunas = self.colunas if colunas is None else [colunas] if isinstance(colunas, str) else colunas
+        with perfilador.etapa('historico.leitura', arquivo=self.caminho) as etapa:
+            dados = pd.DataFrame(self.ler(colunas, iteracoes).reshape(-1, len(colunas)), columns=colunas)
+            if 'iter' in dados.columns:
+                dados['iter'] = dados['iter'].astype(int)
+            etapa.linhas = dados.shape[0]
+        return dados
+
+    def _ler_cabecalho(self):
+        with open(self.caminho, 'rb') as arquivo:
+            assinatura, versao, numero_de_colunas, tamanho_do_cabecalho = struct.unpack(
+                __class__.formato_cabecalho, arquivo.read(struct.calcsize(__class__.formato_cabecalho)))
+            if assinatura != __class__.assinatura or versao > __class__.versao:
+                raise ValueError(f'Arquivo de histórico inválido: {self.caminho}')
+            colunas_json = json.loads(arquivo.read(tamanho_do_cabecalho - struct.calcsize(__class__.formato_cabecalho)).decode('utf-8'))
+        # A versão 1 guardava somente a lista de colunas, sem o mapeamento
+        if versao == 1:
+            self._colunas, self._mapeamento_colunas = colunas_json, None
+        else:
+            self._colunas, self._mapeamento_colunas = colunas_json['colunas'], colunas_json['mapeamento_colunas']
+        self._versao = versao
+        self._tamanho_do_cabecalho = tamanho_do_cabecalho
+
+    @staticmethod
+    def _serializar_mapeamento(mapeamento_colunas):
+        return json.dumps(mapeamento_colunas or None, sort_keys=True)
+
+
+class Simulacao:
+
+    def __init__(self, caminho, mapeamento_colunas=None, historico=False):
+        self._caminho = caminho
+        self._mapeamento_colunas = mapeamento_colunas
+        self._historico = historico
+        self._monitor = None
+        self._parametros_monitor = None
+        self._posicoes_outputlog = dict()
 
     @property
     def caminho(self):
         return self._caminho
+
+    @property
+    def mapeamento_colunas(self):
+        return self._mapeamento_colunas
     
     @property
     def diretorio(self):
@@ -830,7 +2021,8 @@ class Simulacao:
     
     @property
     def numero_da_simulacao(self):
-        return re.search('^(\d{2})_.*', self.diretorio).group(1)
+        numero = re.search('^(\d{2})_.*', self.diretorio)
+        return numero.group(1) if numero else self.diretorio
 
     @property
     def caminho_cases(self):
@@ -838,40 +2030,125 @@ class Simulacao:
 
     @property
     def caminho_running(self):
-        return os.path.join(self.caminho_cases, 'running')
+        # Sem cases/running, os output*.log são procurados no próprio diretório da simulação
+        caminho_running = os.path.join(self.caminho_cases, 'running')
+        return caminho_running if os.path.isdir(caminho_running) else self.caminho
+
+    @property
+    def historico(self):
+        return self._historico
+
+    @property
+    def caminho_historico(self):
+        return os.path.join(self.caminho_running, 'historico_outputlog.bin')
+
+    def obter_historico(self):
+        if self.historico:
+            self.obter_outputlog()
+        return HistoricoOutputlog(self.caminho_historico)
+
+    @property
+    def arquivos_outputlog(self):
+        # Quando um log existe comprimido e descomprimido, somente a versão descomprimida é lida
+        arquivos_log = dict()
+        for arquivo in os.listdir(self.caminho_running):
+            encontrado = padrao_outputlog.search(arquivo)
+            if encontrado:
+                arquivo_descomprimido = arquivo[:encontrado.start(1)] if encontrado.group(1) else arquivo
+                if arquivo_descomprimido not in arquivos_log or not encontrado.group(1):
+                    arquivos_log[arquivo_descomprimido] = os.path.join(self.caminho_running, arquivo)
+        return [arquivos_log[arquivo] for arquivo in sorted(arquivos_log)]
 
     def obter_outputlog(self):
-        coluna_iteracao = ['iter']
-        colunas_residuos = ['continuity', 'x-velocity', 'y-velocity', 'z-velocity', 'k', 'omega']
-        arquivos_log = [os.path.join(self.caminho_running, arquivo) \
-                        for arquivo in os.listdir(self.caminho_running) \
-                        if re.search('output.*\.log', arquivo)]
-        outputlog = list()
-        for arquivo_log in arquivos_log:
-            flag = False
-            dados = list()
-            with open(arquivo_log, 'r', encoding='utf-8') as arquivo:
-                for linha in arquivo:
-                    if linha.strip().startswith('iter') and flag is False:
-                        colunas = linha.strip().split()[0:-1]
-                        colunas_reports = [coluna for coluna in colunas \
-                                          if coluna not in (coluna_iteracao + colunas_residuos)]
-                        flag = True
-                    if flag and re.search('^\d.*\d$', linha.strip()):
-                        dados.append(linha.strip().split()[0:-2])
-            arquivo.close()
-            dados = pd.DataFrame(dados, columns=colunas)
-            dados[coluna_iteracao] = dados[coluna_iteracao].astype(int)
-            dados[colunas_residuos] = dados[colunas_residuos].astype(float)
-            dados[colunas_reports] = dados[colunas_reports].astype(float)
-            outputlog.append(dados)
-        outputlog = pd.concat(outputlog)
-        outputlog.sort_values('iter', inplace=True)
-        outputlog.reset_index(drop=True, inplace=True)
+        if not self.historico:
+            return self._ler_outputlogs()
+        # O histórico é usado enquanto nenhum log tiver sido modificado depois da última atualização e o
+        # mapeamento de colunas for o mesmo; do contrário somente os trechos novos dos logs, a partir das
+        # posições guardadas, são lidos e as iterações novas são anexadas
+        historico = HistoricoOutputlog(self.caminho_historico)
+        arquivos_log = self.arquivos_outputlog
+        compativel = historico.compativel(self.mapeamento_colunas)
+        if compativel and all(os.path.getmtime(arquivo_log) <= os.path.getmtime(historico.caminho) for arquivo_log in arquivos_log):
+            return historico.obter_dados()
+        inicio_da_leitura = time.time()
+        posicoes = historico.posicoes if compativel else dict()
+        novos_dados = self._ler_trechos_novos_outputlogs(arquivos_log, posicoes)
+        if compativel and novos_dados is not None and list(novos_dados.columns) != historico.colunas:
+            # Colunas novas em algum log: o histórico é refeito desde o início dos logs
+            compativel, posicoes = False, dict()
+            novos_dados = self._ler_trechos_novos_outputlogs(arquivos_log, posicoes)
+        if not compativel:
+            if novos_dados is None:
+                return self._ler_outputlogs()
+            historico.criar(list(novos_dados.columns), self.mapeamento_colunas)
+        if novos_dados is not None:
+            ultima_iteracao = historico.ultima_iteracao
+            historico.anexar(novos_dados if ultima_iteracao is None else novos_dados[novos_dados['iter'] > ultima_iteracao])
+        historico.salvar_posicoes(posicoes)
+        os.utime(historico.caminho, (inicio_da_leitura, inicio_da_leitura))
+        return historico.obter_dados()
+
+    def _ler_trechos_novos_outputlogs(self, arquivos_log, posicoes):
+        novos_dados = [dados for dados in (self._ler_trecho_novo_outputlog(arquivo_log, posicoes) for arquivo_log in arquivos_log) if dados is not None]
+        if not novos_dados:
+            return None
+        return pd.concat(novos_dados).sort_values('iter').reset_index(drop=True)
+
+    def _ler_outputlogs(self):
+        outputlog = [self._ler_outputlog(arquivo_log) for arquivo_log in self.arquivos_outputlog]
+        with perfilador.etapa('simulacao.concatenacao', simulacao=self.caminho) as etapa:
+            outputlog = pd.concat(outputlog)
+            outputlog.sort_values('iter', inplace=True)
+            outputlog.reset_index(drop=True, inplace=True)
+            etapa.linhas = outputlog.shape[0]
         return outputlog
 
-    def plotar_outputlog(self, disposicao, graficos, salvar=False):
-        outputlog = self.obter_outputlog()
+    def obter_convergencia(self, janela=500, **tolerancias):
+        monitor = MonitorDeConvergencia(janela, **tolerancias)
+        return monitor.atualizar(self.obter_outputlog())
+
+    def atualizar_convergencia(self, janela=500, **tolerancias):
+        # Lê somente o que foi acrescentado aos logs desde a chamada anterior e alimenta o mesmo monitor;
+        # com outra janela ou outras tolerâncias, o monitor é refeito e os logs são lidos desde o início
+        parametros = (janela, tuple(sorted(tolerancias.items())))
+        if self._monitor is None or parametros != self._parametros_monitor:
+            self._monitor = MonitorDeConvergencia(janela, **tolerancias)
+            self._parametros_monitor = parametros
+            self._posicoes_outputlog = dict()
+        novos_dados = self._ler_trechos_novos_outputlogs(self.arquivos_outputlog, self._posicoes_outputlog)
+        if novos_dados is not None:
+            self._monitor.atualizar(novos_dados)
+        return self._monitor
+
+    def _ler_trecho_novo_outputlog(self, arquivo_log, posicoes):
+        # posicoes: {arquivo: (posição em bytes, colunas)}, atualizado a cada leitura
+        posicao, colunas = posicoes.get(arquivo_log, (0, None))
+        if posicao is None:
+            return None
+        if padrao_outputlog.search(arquivo_log).group(1):
+            # Logs comprimidos são de casos encerrados: são lidos uma única vez
+            dados = self._ler_outputlog(arquivo_log)
+            posicoes[arquivo_log] = (None, list(dados.columns))
+            return dados
+        if os.path.getsize(arquivo_log) < posicao:
+            # Log truncado ou substituído por um novo: é lido de novo desde o início
+            posicao, colunas = 0, None
+        with open(arquivo_log, 'rb') as arquivo:
+            arquivo.seek(posicao)
+            trecho = arquivo.read()
+        # A última linha pode estar incompleta enquanto o solver escreve; fica para a próxima leitura
+        trecho = trecho[:trecho.rfind(b'\n') + 1]
+        linhas = trecho.decode('utf-8').splitlines()
+        colunas, dados = __class__._interpretar_linhas_outputlog(linhas, colunas=colunas, mapeamento_colunas=self.mapeamento_colunas)
+        posicoes[arquivo_log] = (posicao + len(trecho), colunas)
+        if not dados:
+            return None
+        return __class__._converter_outputlog(colunas, dados)
+
+    def plotar_outputlog(self, disposicao, graficos, salvar=False, caminho=None, outputlog=None, formatos=None):
+        plt, ticker = configurar_graficos()
+        if outputlog is None:
+            outputlog = self.obter_outputlog()
         indices = self._gerar_indices_dos_graficos(disposicao)
         fig, axs = plt.subplots(*disposicao, figsize=(16, 9), dpi=600)
         for indice, parametros in zip(indices, graficos):
@@ -880,12 +2157,61 @@ class Simulacao:
         parametros_residuos = {
             'titulo': 'Resíduos',
             'eixo_y': 'Resíduos',
-            'variaveis': ['continuity', 'x-velocity', 'y-velocity', 'z-velocity', 'k', 'omega']
+            'variaveis': colunas_residuos_outputlog
         }
         self._gerar_grafico_individual_outputlog(axs[*indices[-1]], outputlog, **parametros_residuos)
         if salvar:
-            fig.savefig(os.path.join(self.caminho_running, f'fig_gr_case_{self.numero_da_simulacao}_outputlog.pdf'))
-            fig.savefig(os.path.join(self.caminho_running, f'fig_gr_case_{self.numero_da_simulacao}_outputlog.png'))
+            if caminho is None:
+                caminho = self.caminho_running
+            _salvar_figura(fig, caminho, f'fig_gr_case_{self.numero_da_simulacao}_outputlog', formatos)
+            plt.close(fig)
+
+    def _ler_outputlog(self, arquivo_log):
+        with perfilador.etapa('simulacao.leitura_outputlog', arquivo=arquivo_log) as etapa:
+            with _abrir_arquivo_de_texto(arquivo_log) as arquivo:
+                colunas, dados = __class__._interpretar_linhas_outputlog(arquivo, mapeamento_colunas=self.mapeamento_colunas)
+            dados = __class__._converter_outputlog(colunas, dados)
+            etapa.linhas = dados.shape[0]
+        return dados
+
+    @staticmethod
+    def _interpretar_linhas_outputlog(linhas, colunas=None, mapeamento_colunas=None):
+        dados = list()
+        for linha in linhas:
+            linha = linha.strip()
+            if colunas is None and linha.startswith('iter'):
+                colunas = __class__._renomear_colunas_outputlog(linha.split()[0:-1], mapeamento_colunas)
+            if colunas is not None and padrao_linha_outputlog.search(linha):
+                dados.append(linha.split()[0:-2])
+        return colunas, dados
+
+    @staticmethod
+    def _converter_outputlog(colunas, dados):
+        coluna_iteracao = ['iter']
+        colunas_reports = [coluna for coluna in colunas \
+                           if coluna not in (coluna_iteracao + colunas_residuos_outputlog)]
+        dados = pd.DataFrame(dados, columns=colunas)
+        dados[coluna_iteracao] = dados[coluna_iteracao].astype(int)
+        dados[colunas_residuos_outputlog] = dados[colunas_residuos_outputlog].astype(float)
+        dados[colunas_reports] = dados[colunas_reports].astype(float)
+        return dados
+
+    @staticmethod
+    def _renomear_colunas_outputlog(colunas, mapeamento_colunas):
+        # Um destino em texto renomeia todas as ocorrências; uma lista renomeia as ocorrências
+        # repetidas em ordem (ex.: 'rp-h-plane' -> ['rp-velo-150', 'rp-velo-225', 'rp-velo-75'])
+        if not mapeamento_colunas:
+            return colunas
+        pendentes = {coluna: list(destino) for coluna, destino in mapeamento_colunas.items() if type(destino) is not str}
+        colunas_renomeadas = list()
+        for coluna in colunas:
+            if type(mapeamento_colunas.get(coluna)) is str:
+                colunas_renomeadas.append(mapeamento_colunas[coluna])
+            elif pendentes.get(coluna):
+                colunas_renomeadas.append(pendentes[coluna].pop(0))
+            else:
+                colunas_renomeadas.append(coluna)
+        return colunas_renomeadas
 
     @staticmethod
     def _gerar_grafico_individual_outputlog(ax, dados, titulo, eixo_y, variaveis, legendas=None, eixo_x='Iteração'):
@@ -928,7 +2254,9 @@ class Simulacao:
             eq3c = s - np.sign(epsilon[1] / epsilon[0])
             return [eq3a, eq3b, eq3c]
         
-        p = fsolve(eq3, [1, 1, 1], args=(r, epsilon))[0]
+        from scipy.optimize import fsolve
+        with np.errstate(divide='ignore'):
+            p = fsolve(eq3, [1, 1, 1], args=(r, epsilon))[0]
         phi_ext = ((r[0]**p)*phi[0] - phi[1]) / (r[0]**p - 1)
         e_a = np.abs((phi[0] - phi[1]) / (phi[0]))
         e_ext = np.abs((phi_ext - phi[0]) / (phi_ext))
@@ -938,4 +2266,211 @@ class Simulacao:
                                     'phi_1', 'phi_2', 'phi_3', 'phi_ext',
                                     'e_a', 'e_ext', 'gci_fine'],
                             index = ['gci']).transpose()
-        return dados
\ No newline at end of file
+        return dados
+
+
+def _obter_impressao_digital(arquivos):
+    # Caminho, tamanho e data de modificação identificam a versão de cada arquivo sem lê-lo
+    resumo = hashlib.sha256()
+    for arquivo in sorted(os.path.abspath(arquivo) for arquivo in arquivos):
+        estado = os.stat(arquivo)
+        resumo.update(f'{arquivo}|{estado.st_size}|{estado.st_mtime_ns}\n'.encode('utf-8'))
+    return resumo.hexdigest()
+
+
+def _calcular_tempo_de_mistura(caminho, porcentagem, janela_media_movel, dados_correcao_horarios=None, reamostragem='automatica',
+                               intervalo_de_reamostragem=None, lacuna_maxima=None, preprocessamento=None):
+    ensaio = Ensaio(caminho, porcentagem=porcentagem, dados_correcao_horarios=dados_correcao_horarios, janela_media_movel=janela_media_movel,
+                    reamostragem=reamostragem, intervalo_de_reamostragem=intervalo_de_reamostragem, lacuna_maxima=lacuna_maxima,
+                    preprocessamento=preprocessamento)
+    tempos_de_mistura = [float(tm[0]) for tm in ensaio.tempos_de_mistura]
+    return {
+        'tempo_de_mistura': tempos_de_mistura[0] if tempos_de_mistura else None,
+        'tempos_de_mistura': tempos_de_mistura,
+        'temperatura_media': float(ensaio.temperatura_media),
+    }
+
+
+def _calcular_torque_medio(caminho, janela_media_movel, intervalo):
+    torquimetro = Torquimetro(caminho, janela_media_movel=janela_media_movel)
+    return {
+        'torque_medio': float(torquimetro.obter_torque_medio(intervalo)),
+        'potencia_media': float(torquimetro.obter_potencia_media(intervalo)),
+    }
+
+
+def _calcular_gci(h, phi):
+    gci = Simulacao.determinar_gci(h, phi)['gci']
+    return {chave: valor if type(valor) is str or chave == 'h' else float(valor) for chave, valor in gci.items()}
+
+
+class BancoDeResultados:
+
+    def __init__(self, caminho='resultados.sqlite', processos=None):
+        self._caminho = caminho
+        self._processos = os.cpu_count() if processos is None else processos
+        self._conexao = sqlite3.connect(caminho)
+        self._criar_tabelas()
+
+    @property
+    def caminho(self):
+        return self._caminho
+
+    @property
+    def processos(self):
+        return self._processos
+
+    @property
+    def conexao(self):
+        return self._conexao
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    def obter_tempos_de_mistura(self, caminhos, porcentagem=95, janela_media_movel=None, dados_correcao_horarios=None, reamostragem='automatica',
+                                intervalo_de_reamostragem=None, lacuna_maxima=None, preprocessamento=None):
+        # caminhos: diretórios de experimentos (campanhas) ou de ensaios; as demais opções são as de Experimento
+        if reamostragem is not None and reamostragem not in metodos_de_reamostragem:
+            raise ValueError(f'Método de reamostragem desconhecido: {reamostragem}')
+        if type(dados_correcao_horarios) is list:
+            # A planilha é lida uma única vez, e a chave depende do seu conteúdo, que pode mudar sem que o endereço mude
+            dados_correcao_horarios = Experimento._importar_dados_do_google_sheets(*dados_correcao_horarios)
+        parametros = {
+            'porcentagem': porcentagem,
+            'janela_media_movel': janela_media_movel,
+            'dados_correcao_horarios': __class__._obter_impressao_digital_da_tabela(dados_correcao_horarios),
+            'reamostragem': reamostragem,
+            'intervalo_de_reamostragem': None if intervalo_de_reamostragem is None else float(intervalo_de_reamostragem),
+            'lacuna_maxima': None if lacuna_maxima is None else float(lacuna_maxima),
+            'preprocessamento': None if preprocessamento is None else list(preprocessamento.chave),
+        }
+        tarefas = list()
+        for caminho in __class__._localizar_ensaios(caminhos):
+            arquivos = [os.path.join(caminho, arquivo) for arquivo in os.listdir(caminho) if padrao_csv.search(arquivo)]
+            tarefas.append((caminho, os.path.basename(caminho), _obter_impressao_digital(arquivos), parametros,
+                            (caminho, porcentagem, janela_media_movel, dados_correcao_horarios, reamostragem,
+                             intervalo_de_reamostragem, lacuna_maxima, preprocessamento)))
+        return self._obter_resultados('tempo_de_mistura', tarefas, _calcular_tempo_de_mistura)
+
+    def obter_torques_medios(self, arquivos, intervalo=None, janela_media_movel=None):
+        # intervalo: (início, fim) em minutos, como em Torquimetro.obter_torque_medio
+        intervalo = None if intervalo is None else list(intervalo)
+        tarefas = list()
+        for arquivo in arquivos:
+            arquivo = os.path.abspath(arquivo)
+            parametros = {'intervalo': intervalo, 'janela_media_movel': janela_media_movel}
+            tarefas.append((arquivo, os.path.basename(arquivo), _obter_impressao_digital([arquivo]), parametros,
+                            (arquivo, janela_media_movel, intervalo)))
+        return self._obter_resultados('torque_medio', tarefas, _calcular_torque_medio)
+
+    def obter_gci(self, casos):
+        # casos: dicionário {nome: (h, phi)}; a impressão digital é a dos próprios valores de entrada
+        tarefas = list()
+        for nome, (h, phi) in casos.items():
+            parametros = {'h': [float(valor) for valor in h], 'phi': [float(valor) for valor in phi]}
+            impressao_digital = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode('utf-8')).hexdigest()
+            tarefas.append((str(nome), str(nome), impressao_digital, parametros, (parametros['h'], parametros['phi'])))
+        return self._obter_resultados('gci', tarefas, _calcular_gci)
+
+    def consultar(self, tipo=None, caminho=None):
+        # Consulta somente o banco: os parâmetros e os valores de cada resultado viram colunas
+        condicoes, argumentos = list(), list()
+        if tipo is not None:
+            condicoes.append('tipo = ?')
+            argumentos.append(tipo)
+        if caminho is not None:
+            # Comparação literal do prefixo: com LIKE, '_' e '%' nos nomes dos diretórios seriam curingas
+            prefixo = os.path.join(os.path.abspath(caminho), '')
+            condicoes.append('(caminho = ? OR substr(caminho, 1, ?) = ?)')
+            argumentos.extend([os.path.abspath(caminho), len(prefixo), prefixo])
+        sql = 'SELECT tipo, caminho, identificador, parametros, valores, criado_em FROM resultados'
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        linhas = self.conexao.execute(sql + ' ORDER BY tipo, caminho', argumentos).fetchall()
+        return __class__._montar_tabela(linhas)
+
+    def _criar_tabelas(self):
+        with self.conexao:
+            self.conexao.execute('''
+                CREATE TABLE IF NOT EXISTS resultados (
+                    tipo TEXT NOT NULL,
+                    caminho TEXT NOT NULL,
+                    identificador TEXT NOT NULL,
+                    impressao_digital TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    valores TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    PRIMARY KEY (tipo, impressao_digital, parametros)
+                )''')
+            self.conexao.execute('CREATE INDEX IF NOT EXISTS indice_resultados_caminho ON resultados (tipo, caminho)')
+
+    def _obter_resultados(self, tipo, tarefas, funcao):
+        # tarefas: (caminho, identificador, impressao_digital, parametros, argumentos de funcao);
+        # somente as ausentes do banco são calculadas, em paralelo, e gravadas em uma única transação
+        chaves = [(impressao_digital, json.dumps(parametros, sort_keys=True)) for _, _, impressao_digital, parametros, _ in tarefas]
+        with perfilador.etapa('banco.consulta', tipo=tipo) as etapa:
+            encontrados = dict()
+            for impressao_digital, parametros in chaves:
+                linha = self.conexao.execute('SELECT valores, criado_em FROM resultados WHERE tipo = ? AND impressao_digital = ? AND parametros = ?',
+                                             (tipo, impressao_digital, parametros)).fetchone()
+                if linha is not None:
+                    encontrados[(impressao_digital, parametros)] = linha
+            etapa.linhas = len(encontrados)
+        ausentes = [i for i, chave in enumerate(chaves) if chave not in encontrados]
+        if ausentes:
+            with perfilador.etapa('banco.calculo', tipo=tipo) as etapa:
+                if self.processos is None or self.processos <= 1 or len(ausentes) == 1:
+                    calculados = [funcao(*tarefas[i][4]) for i in ausentes]
+                else:
+                    with ProcessPoolExecutor(max_workers=min(self.processos, len(ausentes))) as executor:
+                        calculados = list(executor.map(funcao, *zip(*[tarefas[i][4] for i in ausentes])))
+                etapa.linhas = len(ausentes)
+            criado_em = time.time()
+            with self.conexao:
+                # Resultados da mesma entrada com outra impressão digital são de uma versão anterior dos arquivos
+                self.conexao.executemany('DELETE FROM resultados WHERE tipo = ? AND caminho = ? AND parametros = ?',
+                                         [(tipo, tarefas[i][0], chaves[i][1]) for i in ausentes])
+                self.conexao.executemany('INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                         [(tipo, tarefas[i][0], tarefas[i][1], chaves[i][0], chaves[i][1], json.dumps(valores), criado_em)
+                                          for i, valores in zip(ausentes, calculados)])
+            encontrados.update({chaves[i]: (valores, criado_em) for i, valores in zip(ausentes, calculados)})
+        linhas = [(tipo, caminho, identificador, chave[1], *encontrados[chave])
+                  for (caminho, identificador, _, _, _), chave in zip(tarefas, chaves)]
+        return __class__._montar_tabela(linhas)
+
+    @staticmethod
+    def _montar_tabela(linhas):
+        registros = list()
+        for tipo, caminho, identificador, parametros, valores, criado_em in linhas:
+            valores = json.loads(valores) if type(valores) is str else valores
+            registros.append({'tipo': tipo, 'caminho': caminho, 'identificador': identificador,
+                              **json.loads(parametros), **valores, 'criado_em': criado_em})
+        return pd.DataFrame(registros)
+
+    @staticmethod
+    def _localizar_ensaios(caminhos):
+        ensaios = list()
+        for caminho in caminhos:
+            caminho = os.path.abspath(caminho)
+            if padrao_diretorio.search(os.path.basename(caminho)) and any(padrao_csv.search(arquivo) for arquivo in os.listdir(caminho)):
+                ensaios.append(caminho)
+                continue
+            diretorios = [diretorio for diretorio in os.listdir(caminho)
+                          if padrao_diretorio.search(diretorio) and os.path.isdir(os.path.join(caminho, diretorio))]
+            diretorios.sort(key=lambda diretorio: int(padrao_diretorio.search(diretorio).group(2)))
+            ensaios.extend(os.path.join(caminho, diretorio) for diretorio in diretorios
+                           if any(padrao_csv.search(arquivo) for arquivo in os.listdir(os.path.join(caminho, diretorio))))
+        return ensaios
+
+    @staticmethod
+    def _obter_impressao_digital_da_tabela(dados):
+        # Os horários de correção entram na chave pelo conteúdo da tabela
+        if dados is None:
+            return None
+        return hashlib.sha256(dados.astype(str).to_json(orient='split').encode('utf-8')).hexdigest()
\ No newline at end of file